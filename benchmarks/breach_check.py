@@ -0,0 +1,48 @@
+"""
+Задержка поиска пароля во временном индексе утечек
+python -m benchmarks.breach_check
+"""
+import os
+import random
+import tempfile
+import time
+
+from cor_pass.services.breach_check import HASH_SIZE, BreachIndex, build_breach_index
+
+
+def benchmark(count: int = 2_000_000, lookups: int = 100_000) -> None:
+    """
+    The benchmark function builds an index of count random hashes in a temporary
+    directory and measures the latency of hits, misses and full password checks.
+    """
+    generator = random.Random(0)
+    hashes = sorted({generator.randbytes(HASH_SIZE) for _ in range(count)})
+    hits = generator.sample(hashes, lookups)
+    misses = [generator.randbytes(HASH_SIZE) for _ in range(lookups)]
+    passwords = [f"password{index}" for index in range(lookups)]
+    with tempfile.TemporaryDirectory() as directory:
+        source_path = os.path.join(directory, "hashes.txt")
+        with open(source_path, "w") as source:
+            source.writelines(f"{value.hex().upper()}:1\n" for value in hashes)
+        started = time.perf_counter()
+        build_breach_index(source_path, os.path.join(directory, "breach.idx"))
+        print(f"build: {len(hashes)} hashes in {time.perf_counter() - started:.1f} s")
+        index = BreachIndex(os.path.join(directory, "breach.idx"))
+        started = time.perf_counter()
+        index.contains_sha1(misses[0])
+        elapsed = time.perf_counter() - started
+        print(f"first lookup (open + map): {elapsed * 1e6:.0f} us")
+        for name, lookup, values in (
+            ("hit", index.contains_sha1, hits),
+            ("miss", index.contains_sha1, misses),
+            ("password", index.contains_password, passwords),
+        ):
+            started = time.perf_counter()
+            for value in values:
+                lookup(value)
+            elapsed = time.perf_counter() - started
+            print(f"{name}: {elapsed / len(values) * 1e6:.2f} us per lookup")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,36 @@
+"""
+Пакетная проверка Cor-ID на настроенной базе данных
+python -m benchmarks.cor_id
+"""
+import time
+
+from sqlalchemy import select
+
+from cor_pass.database.db import SessionLocal
+from cor_pass.database.models import User
+from cor_pass.repository.cor_id import resolve_cor_ids
+
+
+def benchmark(batch_size: int = 10000, rounds: int = 5) -> None:
+    """
+    The benchmark function measures how many Cor-IDs per second resolve_cor_ids resolves
+    against the configured database: existing ids padded with unknown ones to batch_size.
+    """
+    with SessionLocal() as db:
+        cor_ids = list(
+            db.scalars(select(User.cor_id).where(User.cor_id.isnot(None)).limit(batch_size))
+        )
+        known = len(cor_ids)
+        cor_ids += [f"UNKNOWN{index}-1900M" for index in range(batch_size - known)]
+        started = time.perf_counter()
+        for _ in range(rounds):
+            found = sum(1 for _ in resolve_cor_ids(cor_ids, db))
+        elapsed = (time.perf_counter() - started) / rounds
+    print(
+        f"{batch_size} ids ({known} existing, {found} found): "
+        f"{elapsed * 1000:.1f} ms per call, {batch_size / elapsed:,.0f} ids/s"
+    )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,29 @@
+"""
+Рендеринг писем: Template.render и PrecompiledTemplate.render
+python -m benchmarks.email_templates
+"""
+import time
+
+from cor_pass.services.email import compiled_templates
+
+
+def benchmark(rounds: int = 20000) -> None:
+    """
+    The benchmark function compares rendering each mail template through
+    jinja with the substitution of fields into its pre-rendered chunks.
+    """
+    for name, compiled in compiled_templates.items():
+        fields = {field: f"{field} <value>" for field in compiled.fields}
+        for method, render in (
+            ("Template.render", lambda: compiled.template.render(**fields)),
+            ("precompiled", lambda: compiled.render(fields)),
+        ):
+            started = time.perf_counter()
+            for _ in range(rounds):
+                render()
+            rate = rounds / (time.perf_counter() - started)
+            print(f"{name:>36}, {method:>15}: {rate:10.0f} messages/s")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,65 @@
+"""
+Подпись и проверка access-токенов: HS256 и ES256
+python -m benchmarks.jwt_signing
+"""
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from jose import jwt
+
+from cor_pass.services.jwks import SigningKeyStore, generate_signing_key
+
+
+def benchmark(seconds: float = 2.0) -> None:
+    """
+    The benchmark function prints how many tokens per second are signed and verified with
+    the shared HS256 secret and with an ES256 key of a SigningKeyStore, the way
+    auth_service encodes and decodes them.
+    """
+    claims = {
+        "oid": "ABC123-2024M",
+        "scp": "access_token",
+        "iat": datetime.now(timezone.utc),
+        "exp": datetime.now(timezone.utc) + timedelta(minutes=15),
+    }
+    with tempfile.TemporaryDirectory() as keys_dir:
+        generate_signing_key(keys_dir, "ES256")
+        store = SigningKeyStore(keys_dir, "ES256")
+        store.load()
+    kid, signing_key = store.signing_key
+    secret = "benchmark-secret"
+
+    def es256_decode(token):
+        kid = jwt.get_unverified_header(token)["kid"]
+        return jwt.decode(token, store.verification_key(kid), algorithms="ES256")
+
+    cases = [
+        (
+            "HS256",
+            lambda: jwt.encode(claims, key=secret, algorithm="HS256"),
+            lambda token: jwt.decode(token, key=secret, algorithms="HS256"),
+        ),
+        (
+            "ES256",
+            lambda: jwt.encode(
+                claims, signing_key, algorithm="ES256", headers={"kid": kid}
+            ),
+            es256_decode,
+        ),
+    ]
+    for name, encode, decode in cases:
+        token = encode()
+        for operation, run in (("sign", encode), ("verify", lambda: decode(token))):
+            done = 0
+            started = time.perf_counter()
+            deadline = started + seconds
+            while time.perf_counter() < deadline:
+                run()
+                done += 1
+            rate = done / (time.perf_counter() - started)
+            print(f"{name} {operation:>6}: {rate:10,.0f} tokens/s")
+
+
+if __name__ == "__main__":
+    benchmark()
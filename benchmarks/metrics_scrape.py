@@ -0,0 +1,60 @@
+"""
+Стоимость одного /metrics в режиме multiprocess при многих воркерах
+python -m benchmarks.metrics_scrape [workers]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROUTES = 50
+
+
+def _worker() -> None:
+    # Каталог уже задан в окружении родителя до импорта prometheus_client
+    from cor_pass.services import metrics, sql_metrics
+
+    for index in range(ROUTES):
+        route = f"/api/route_{index}"
+        for method, status in (("GET", "2xx"), ("POST", "2xx"), ("GET", "4xx")):
+            labels = (method, route, status)
+            metrics.REQUEST_COUNT.labels(*labels).inc()
+            metrics.REQUEST_LATENCY.labels(*labels).observe(0.02)
+            metrics.RESPONSE_SIZE.labels(*labels).observe(2048)
+        sql_metrics.DB_STATEMENTS.labels(route).observe(3)
+        sql_metrics.DB_TIME.labels(route).observe(0.005)
+    metrics.REQUESTS_IN_PROGRESS.labels("GET").inc()
+
+
+def benchmark(workers: int = 32, rounds: int = 20) -> None:
+    """
+    The benchmark function lets workers processes record the RED and SQL series of
+    ROUTES routes into a shared PROMETHEUS_MULTIPROC_DIR, then times render_metrics,
+    which merges every worker's files on each scrape.
+    """
+    with tempfile.TemporaryDirectory() as multiproc_dir:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = multiproc_dir
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=_worker) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        from cor_pass.services.metrics import render_metrics
+
+        content, _ = render_metrics()
+        started = time.perf_counter()
+        for _ in range(rounds):
+            render_metrics()
+        elapsed = (time.perf_counter() - started) / rounds
+        files = len(os.listdir(multiproc_dir))
+    print(
+        f"{workers} workers, {files} files, {len(content) / 1024:.0f} KiB: "
+        f"{elapsed * 1000:.1f} ms per scrape"
+    )
+
+
+if __name__ == "__main__":
+    benchmark(*(int(arg) for arg in sys.argv[1:2]))
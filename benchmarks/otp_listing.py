@@ -0,0 +1,50 @@
+"""
+Страница /otp_auth/all: секреты в открытом виде и под AES-GCM
+python -m benchmarks.otp_listing
+"""
+import asyncio
+import base64
+import os
+import time
+from types import SimpleNamespace
+
+from cor_pass.repository.otp_auth import decrypt_otp_secrets
+from cor_pass.services.cipher import aead_encrypt, encrypt_user_key, generate_aes_key
+from cor_pass.services.cor_otp import TOTPEngine
+
+
+def benchmark(page_size: int = 150, rounds: int = 20) -> None:
+    """
+    The benchmark function times the secrets and codes of one /otp_auth/all page:
+    legacy plaintext secrets against AES-GCM secrets, whose user key is unwrapped once
+    per request. The database read and serialization are the same for both and left out.
+    """
+
+    async def run():
+        key = await generate_aes_key()
+        user = SimpleNamespace(
+            id="0b1e7c5a-3c1d-4d7e-9a53-4f3b2c1d0e9f",
+            unique_cipher_key=await encrypt_user_key(key),
+        )
+        secrets = [base64.b32encode(os.urandom(20)).decode() for _ in range(page_size)]
+        pages = {
+            "plaintext": [SimpleNamespace(private_key=secret) for secret in secrets],
+            "AES-GCM": [
+                SimpleNamespace(private_key=aead_encrypt(secret, key, user.id.encode()))
+                for secret in secrets
+            ],
+        }
+        engine = TOTPEngine()
+        for name, records in pages.items():
+            started = time.perf_counter()
+            for _ in range(rounds):
+                private_keys = await decrypt_otp_secrets(user, records)
+                engine.generate_many(private_keys)
+            elapsed = (time.perf_counter() - started) / rounds
+            print(f"{name:>10}: {elapsed * 1000:8.2f} ms per {page_size}-record page")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,57 @@
+"""
+Нагрузка на /otp_auth/stream: много подписчиков одного запущенного сервера
+python -m benchmarks.otp_stream http://localhost:8000 user@example.com password [clients]
+"""
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+import websockets
+
+
+async def _subscriber(url: str, token: str, connected: list, pushed: list) -> None:
+    async with websockets.connect(url) as websocket:
+        started = time.perf_counter()
+        await websocket.send(json.dumps({"token": token}))
+        await websocket.recv()
+        connected.append(time.perf_counter() - started)
+        await websocket.recv()
+        pushed.append(time.time())
+
+
+async def benchmark(base_url: str, email: str, password: str, clients: int = 500) -> None:
+    """
+    The benchmark function opens clients streams of one user at once, then waits for the
+    next TOTP window boundary. It prints how long the first frame took (authentication,
+    loading and decrypting the records) and how far apart the boundary pushes arrived.
+    """
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        response = await client.post(
+            "/api/auth/login", data={"username": email, "password": password}
+        )
+        response.raise_for_status()
+        token = response.json()["access_token"]
+    url = base_url.replace("http", "ws", 1) + "/api/otp_auth/stream"
+    connected, pushed = [], []
+    await asyncio.gather(
+        *(_subscriber(url, token, connected, pushed) for _ in range(clients))
+    )
+    connected.sort()
+    boundary = pushed and min(pushed) // 30 * 30
+    print(f"{clients} streams")
+    print(
+        f"first frame: median {connected[len(connected) // 2] * 1000:.1f} ms, "
+        f"max {connected[-1] * 1000:.1f} ms"
+    )
+    print(
+        f"window push: first {(min(pushed) - boundary) * 1000:.1f} ms, "
+        f"last {(max(pushed) - boundary) * 1000:.1f} ms after the boundary"
+    )
+
+
+if __name__ == "__main__":
+    base_url, email, password = sys.argv[1:4]
+    clients = int(sys.argv[4]) if len(sys.argv) > 4 else 500
+    asyncio.run(benchmark(base_url, email, password, clients))
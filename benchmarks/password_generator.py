@@ -0,0 +1,33 @@
+"""
+Скорость генераторов паролей
+python -m benchmarks.password_generator
+"""
+import time
+
+from cor_pass.repository.password_generator import generate_passwords, generate_word_passwords
+from cor_pass.schemas import PasswordGeneratorSettings, WordPasswordGeneratorSettings
+
+
+def benchmark(seconds: float = 2.0) -> None:
+    """
+    The benchmark function prints how many passwords per second each generator produces,
+    one at a time and in batches.
+    """
+    cases = [
+        ("password", generate_passwords, PasswordGeneratorSettings),
+        ("word password", generate_word_passwords, WordPasswordGeneratorSettings),
+    ]
+    for name, generate, settings_model in cases:
+        for count in (1, 100):
+            settings = settings_model(count=count)
+            generated = 0
+            started = time.perf_counter()
+            deadline = started + seconds
+            while time.perf_counter() < deadline:
+                generated += len(generate(settings))
+            rate = generated / (time.perf_counter() - started)
+            print(f"{name:>14}, count={count:<3}: {rate:12,.0f} passwords/s")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,71 @@
+"""
+Пакетное изменение записей (/records/batch) против последовательных запросов
+python -m benchmarks.record_batch
+"""
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from cor_pass.database.models import Base, Record, User
+from cor_pass.repository.records import apply_record_batch, update_record
+from cor_pass.schemas import CreateRecordModel, RecordOperation
+from cor_pass.services.cipher import encrypt_user_key, generate_aes_key
+
+
+def benchmark_batch(operations: int = 200) -> None:
+    """
+    The benchmark_batch function times operations record updates sent one by one through
+    update_record against the same updates sent as one apply_record_batch call, on a
+    throwaway in-memory SQLite database. With a networked database every saved round trip
+    and commit adds to the difference.
+    """
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+
+    async def run():
+        with Session(bind=engine) as db:
+            user = User(
+                id=str(uuid.uuid4()),
+                email="benchmark@example.com",
+                password="-",
+                user_sex="M",
+                birth=1990,
+                unique_cipher_key=await encrypt_user_key(await generate_aes_key()),
+            )
+            db.add(user)
+            db.add_all(
+                Record(user_id=user.id, record_name=f"record {index}")
+                for index in range(operations)
+            )
+            db.commit()
+            record_ids = db.scalars(select(Record.record_id)).all()
+            body = CreateRecordModel(
+                record_name="renamed", username="user", password="secret", tag_names=["work"]
+            )
+            started = time.perf_counter()
+            for record_id in record_ids:
+                await update_record(record_id, body, user, db)
+            sequential = time.perf_counter() - started
+            batch = [
+                RecordOperation(op="update", record_id=record_id, record=body)
+                for record_id in record_ids
+            ]
+            started = time.perf_counter()
+            await apply_record_batch(db, user, batch, None)
+            batched = time.perf_counter() - started
+        return sequential, batched
+
+    sequential, batched = asyncio.run(run())
+    print(
+        f"{operations} updates: sequential {sequential * 1000:8.1f} ms, "
+        f"batch {batched * 1000:8.1f} ms"
+    )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    benchmark_batch()
@@ -0,0 +1,59 @@
+"""
+Выборка изменений записей (/records/changes) в хранилищах разного размера
+python -m benchmarks.record_changes
+"""
+import asyncio
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from cor_pass.database.models import Base, Record
+from cor_pass.repository.records import SyncCursor, get_record_changes
+
+
+def benchmark_changes(vault_sizes=(1000, 10000, 100000), changes: int = 20) -> None:
+    """
+    The benchmark_changes function times get_record_changes for a fixed number of changes
+    in vaults of growing size, on a throwaway in-memory SQLite database.
+    """
+    for vault_size in vault_sizes:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        base_time = datetime(2024, 1, 1)
+        with Session(bind=engine) as db:
+            db.execute(
+                insert(Record),
+                [
+                    {
+                        "user_id": "benchmark",
+                        "record_name": f"record {index}",
+                        "created_at": base_time,
+                        "edited_at": base_time,
+                        "change_seq": index + 1,
+                    }
+                    for index in range(vault_size)
+                ],
+            )
+            db.commit()
+            cursor = SyncCursor(vault_size - changes, vault_size - changes, 0, 0)
+            rounds = 50
+
+            async def run_rounds():
+                for _ in range(rounds):
+                    result = await get_record_changes(db, "benchmark", cursor, 500)
+                return result
+
+            started = time.perf_counter()
+            result = asyncio.run(run_rounds())
+            elapsed = (time.perf_counter() - started) / rounds
+        print(
+            f"vault {vault_size:>7} records, {len(result['records'])} changes: "
+            f"{elapsed * 1000:7.2f} ms per sync"
+        )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    benchmark_changes()
@@ -0,0 +1,70 @@
+"""
+Задержка поиска записей (/records/search) в хранилище на 100 тысяч записей
+python -m benchmarks.record_search
+"""
+import asyncio
+import random
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from cor_pass.database.models import Base, Record, RecordTag, Tag
+from cor_pass.repository.records import search_records
+
+
+def benchmark_search(vault_size: int = 100000, queries: int = 200) -> None:
+    """
+    The benchmark_search function reports the p50 / p95 latency of search_records in a
+    vault of vault_size records, on a throwaway in-memory SQLite database (no trigram
+    index there: every query scans the user's records).
+    """
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    words = ["mail", "bank", "shop", "cloud", "forum", "news", "game", "work"]
+    with Session(bind=engine) as db:
+        db.execute(
+            insert(Record),
+            [
+                {
+                    "user_id": "benchmark",
+                    "record_name": f"{words[index % len(words)]} account {index}",
+                    "website": f"https://{words[index * 7 % len(words)]}{index}.example.com",
+                }
+                for index in range(vault_size)
+            ],
+        )
+        db.execute(
+            insert(Tag),
+            [{"user_id": "benchmark", "name": word, "usage_count": 0} for word in words],
+        )
+        db.execute(
+            insert(RecordTag),
+            [
+                {"record_id": index + 1, "tag_id": index % len(words) + 1}
+                for index in range(vault_size)
+            ],
+        )
+        db.commit()
+        rng = random.Random(1)
+
+        async def run():
+            timings = []
+            for _ in range(queries):
+                query = f"{rng.choice(words)} account {rng.randrange(vault_size // 10)}"
+                tags = [rng.choice(words)] if rng.random() < 0.5 else []
+                started = time.perf_counter()
+                await search_records(db, "benchmark", query, tags, None, 50)
+                timings.append(time.perf_counter() - started)
+            return sorted(timings)
+
+        timings = asyncio.run(run())
+    print(
+        f"search in {vault_size} records: p50 {timings[len(timings) // 2] * 1000:.1f} ms, "
+        f"p95 {timings[int(len(timings) * 0.95)] * 1000:.1f} ms"
+    )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    benchmark_search()
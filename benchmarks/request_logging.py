@@ -0,0 +1,70 @@
+"""
+Накладные расходы журнала запросов на один HTTP-запрос
+python -m benchmarks.request_logging
+Пишет строки доступа в настроенные приемники (logs/application.log и stdout).
+"""
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
+from cor_pass.services.logger import logger, logging_middleware
+
+
+async def _pass_through(request, call_next):
+    return await call_next(request)
+
+
+def _app(middleware) -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    if middleware is not None:
+        app.middleware("http")(middleware)
+    return app
+
+
+def benchmark(requests: int = 2000) -> None:
+    """
+    The benchmark function sends requests in process to a one-route app without
+    middleware, with an empty http middleware and with logging_middleware, and prints
+    the time per request of each and the cost of a single queued log call.
+    """
+
+    async def run():
+        results = {}
+        for name, middleware in (
+            ("no middleware", None),
+            ("empty middleware", _pass_through),
+            ("logging_middleware", logging_middleware),
+        ):
+            transport = httpx.ASGITransport(app=_app(middleware))
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench"
+            ) as client:
+                await client.get("/ping")
+                started = time.perf_counter()
+                for _ in range(requests):
+                    await client.get("/ping")
+                results[name] = (time.perf_counter() - started) / requests
+            print(f"{name:>20}: {results[name] * 1e6:8.1f} us per request")
+        overhead = results["logging_middleware"] - results["empty middleware"]
+        print(f"{'logging overhead':>20}: {overhead * 1e6:8.1f} us per request")
+
+        started = time.perf_counter()
+        for _ in range(requests):
+            logger.bind(latency_ms=1.0, status=200).info("{} {}", "GET", "/ping")
+        elapsed = (time.perf_counter() - started) / requests
+        await logger.complete()
+        print(f"{'one log call':>20}: {elapsed * 1e6:8.1f} us")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    benchmark()
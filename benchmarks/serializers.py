@@ -0,0 +1,54 @@
+"""
+Сериализация страницы записей: путь FastAPI по умолчанию и records_serializer
+python -m benchmarks.serializers
+"""
+import json
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+
+from cor_pass.services.serializers import records_serializer
+
+
+def benchmark(page_size: int = 1000, rounds: int = 50) -> None:
+    """
+    The benchmark function compares the serialization of a page of records by FastAPI's
+    default path (validation, jsonable_encoder, json.dumps) and by records_serializer.
+    """
+    now = datetime.now()
+    page = [
+        SimpleNamespace(
+            record_id=index,
+            record_name=f"record {index}",
+            website="https://example.com",
+            username="user@example.com",
+            password="v1:" + "A" * 60,
+            created_at=now,
+            edited_at=now,
+            notes="notes",
+            user_id="0b1e7c5a-3c1d-4d7e-9a53-4f3b2c1d0e9f",
+            tags=[SimpleNamespace(name="work"), SimpleNamespace(name="mail")],
+        )
+        for index in range(page_size)
+    ]
+    adapter = records_serializer.adapter
+
+    def default_path():
+        validated = adapter.validate_python(page, from_attributes=True)
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    for name, serialize in (
+        ("jsonable_encoder + json", default_path),
+        ("TypeAdapter.dump_json", lambda: records_serializer.dump(page)),
+    ):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            serialize()
+        elapsed = (time.perf_counter() - started) / rounds
+        print(f"{name:>24}: {elapsed * 1000:8.2f} ms per {page_size}-record page")
+
+
+if __name__ == "__main__":
+    benchmark()
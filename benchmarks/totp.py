@@ -0,0 +1,42 @@
+"""
+Коды страницы OTP-записей: pyotp по записи и TOTPEngine.generate_many
+python -m benchmarks.totp
+"""
+import base64
+import os
+import time
+
+import pyotp
+
+from cor_pass.services.cor_otp import TOTPEngine
+
+
+def benchmark(page_size: int = 500, rounds: int = 200) -> None:
+    """
+    The benchmark function times the codes of one page of OTP records: with pyotp, with
+    a fresh TOTPEngine (first request of a window) and with memoized codes (later
+    requests in the same window).
+    """
+    secrets = [base64.b32encode(os.urandom(20)).decode() for _ in range(page_size)]
+    keys = [(record_id, 1) for record_id in range(page_size)]
+    now = time.time()
+    engine = TOTPEngine()
+
+    def cold():
+        engine._codes_for_window(None)
+        engine.generate_many(secrets, now, keys)
+
+    for name, generate in (
+        ("pyotp", lambda: [pyotp.TOTP(secret).at(now) for secret in secrets]),
+        ("TOTPEngine, cold", cold),
+        ("TOTPEngine, memoized", lambda: engine.generate_many(secrets, now, keys)),
+    ):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            generate()
+        elapsed = (time.perf_counter() - started) / rounds
+        print(f"{name:>20}: {elapsed * 1000:8.3f} ms per {page_size}-record page")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -20,6 +20,13 @@ class Settings(BaseSettings):
     mail_from: str = "Cor.Auth@EXAMPLE.COM"
     mail_port: int = 0
     mail_server: str = "MAIL_SERVER"
+    mail_pool_size: int = 4  # постоянных SMTP-соединений на воркер
+    mail_batch_size: int = 50
+    mail_max_attempts: int = 6
+    mail_retry_base_delay: int = 30  # секунд, удваивается с каждой попыткой
+    mail_dispatch_interval: float = 2.0
+    mail_lease_seconds: int = 300
+    mail_batch_timeout: float = 120.0  # секунд на пакет, меньше mail_lease_seconds
     pythonpath: str = "PYTHONPATH"
     encryption_key: str = "ENCRYPTION_KEY"
     app_env: str = "ENVIROMENT"
@@ -29,6 +36,25 @@ class Settings(BaseSettings):
     basic_account_records: int = "NUMBER_OF_RECORDS"
     facility_key: int = "1"
     admin_accounts: list = json.loads(os.getenv("ETERNAL_ACCOUNTS", "[]"))
+    jwt_keys_dir: str = "keys"  # PEM-ключи подписи для ES256, имя файла = kid
+    jwks_max_age: int = 300
+    metrics_latency_buckets: list = [
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+    ]
+    metrics_size_buckets: list = [
+        256, 1024, 4096, 16384, 65536, 262144, 1048576
+    ]
+    otp_verify_drift: int = 1  # допустимое смещение в окнах TOTP (±N)
+    otp_replay_cache_size: int = 200000
+    otp_replay_redis_url: str = ""  # redis://... - обязателен при нескольких воркерах
+    wordlists_dir: str = "wordlists"  # словари <name>.cwl для парольных фраз
+    breach_index_path: str = "breach/pwned-passwords.idx"  # python -m cor_pass.services.breach_check build
+    import_max_records: int = 100000  # записей за один импорт
+    import_batch_size: int = 500  # записей на транзакцию при импорте
+    sql_slow_query_seconds: float = 0.25
+    sql_query_budget: int = 50  # запросов к БД на один HTTP-запрос
+    sql_query_budgets: dict = {}  # {"/api/records/all": 5} - по шаблону маршрута
+    sql_query_budget_strict: bool = False  # True в тестах: превышение - ошибка
 
     class Config:
 
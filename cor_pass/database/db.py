@@ -1,11 +1,15 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from cor_pass.config.config import settings
+from cor_pass.services import sql_metrics
 
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
+event.listen(engine, "before_cursor_execute", sql_metrics.before_cursor_execute)
+event.listen(engine, "after_cursor_execute", sql_metrics.after_cursor_execute)
+event.listen(engine, "handle_error", sql_metrics.handle_error)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
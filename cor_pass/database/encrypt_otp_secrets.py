@@ -0,0 +1,23 @@
+"""
+Миграция: шифрование OTP ключей, сохраненных открытым текстом
+python -m cor_pass.database.encrypt_otp_secrets [batch_size]
+"""
+import asyncio
+import sys
+
+from cor_pass.database.db import SessionLocal
+from cor_pass.repository.otp_auth import encrypt_plaintext_otp_secrets
+from cor_pass.services.logger import logger
+
+
+async def main(batch_size: int) -> None:
+    db = SessionLocal()
+    try:
+        encrypted = await encrypt_plaintext_otp_secrets(db, batch_size)
+        logger.info("Encrypted {} otp secrets", encrypted)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,152 @@
+"""
+Создание и миграция схемы базы
+python -m cor_pass.database.migrations
+
+Запускается один раз при установке и каждом обновлении, до старта воркеров приложения.
+Повторный запуск ничего не меняет.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from cor_pass.database.db import engine
+from cor_pass.database.models import Base
+from cor_pass.services.logger import logger
+
+def create_tables(engine: Engine) -> None:
+    """
+    The create_tables function creates the tables that do not exist yet, with their
+    indexes; existing tables are changed by the steps below.
+    """
+    Base.metadata.create_all(bind=engine)
+
+
+# Тэги были общими для всех пользователей (уникальное name). Каждый общий тэг достается
+# первому владельцу его записей, остальные владельцы получают свою копию. Тэги без записей
+# остаются без владельца (user_id NULL) и перечисляются в логе.
+_TAGS_PER_USER = (
+    "ALTER TABLE tags ADD COLUMN user_id VARCHAR(36)",
+    "ALTER TABLE tags ADD COLUMN usage_count INTEGER NOT NULL DEFAULT 0",
+    """
+    UPDATE tags SET user_id = (
+        SELECT MIN(records.user_id) FROM records_tags
+        JOIN records ON records.record_id = records_tags.record_id
+        WHERE records_tags.tag_id = tags.id
+    )
+    """,
+    """
+    INSERT INTO tags (name, user_id, usage_count)
+    SELECT DISTINCT tags.name, records.user_id, 0 FROM records_tags
+    JOIN records ON records.record_id = records_tags.record_id
+    JOIN tags ON tags.id = records_tags.tag_id
+    WHERE records.user_id <> tags.user_id
+    """,
+    """
+    UPDATE records_tags SET tag_id = (
+        SELECT own.id FROM tags shared, tags own, records
+        WHERE shared.id = records_tags.tag_id
+        AND records.record_id = records_tags.record_id
+        AND own.name = shared.name AND own.user_id = records.user_id
+    )
+    WHERE EXISTS (
+        SELECT 1 FROM tags shared, records
+        WHERE shared.id = records_tags.tag_id
+        AND records.record_id = records_tags.record_id
+        AND shared.user_id <> records.user_id
+    )
+    """,
+    """
+    UPDATE tags SET usage_count = (
+        SELECT COUNT(*) FROM records_tags WHERE records_tags.tag_id = tags.id
+    )
+    """,
+)
+
+
+def migrate_tags_per_user(engine: Engine) -> None:
+    """
+    The migrate_tags_per_user function converts a tags table of the global schema
+    (no user_id column) into per-user tags with usage counts, in one transaction.
+    It does nothing on a database that is already migrated. Tags that no record uses
+    have no owner to go to: they are kept with user_id NULL and listed in the log.
+
+    On SQLite the old unique constraint on name cannot be dropped in place, so the
+    migration fails there if a tag is shared by several users; development databases
+    of the old schema should be recreated.
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns("tags")}
+    if "user_id" in columns:
+        return
+    with engine.begin() as connection:
+        postgresql = connection.dialect.name == "postgresql"
+        if postgresql:
+            # Иначе копии тэга для других владельцев нарушат уникальность name
+            connection.execute(text("ALTER TABLE tags DROP CONSTRAINT IF EXISTS tags_name_key"))
+        for statement in _TAGS_PER_USER:
+            connection.execute(text(statement))
+        unowned = connection.scalars(
+            text("SELECT name FROM tags WHERE user_id IS NULL ORDER BY name")
+        ).all()
+    logger.info("Tags migrated to per-user tags")
+    if unowned:
+        logger.warning(
+            "{} tags without records were left without an owner: {}",
+            len(unowned),
+            ", ".join(unowned),
+        )
+
+
+# Курсор /records/changes строится на версии хранилища вместо edited_at
+_CHANGE_SEQ_TABLES = ("records", "record_tombstones")
+_EDITED_AT_INDEXES = ("ix_records_user_edited", "ix_record_tombstones_user")
+
+
+def add_change_seq(engine: Engine) -> None:
+    """
+    The add_change_seq function adds the change_seq columns of records and tombstones
+    and drops the indexes of the old edited_at cursor. Existing rows get change_seq 0:
+    clients holding an old cursor get 400 and sync from scratch.
+    """
+    inspector = inspect(engine)
+    tables = [
+        table
+        for table in _CHANGE_SEQ_TABLES
+        if "change_seq" not in {column["name"] for column in inspector.get_columns(table)}
+    ]
+    if not tables:
+        return
+    with engine.begin() as connection:
+        for table in tables:
+            connection.execute(
+                text(f"ALTER TABLE {table} ADD COLUMN change_seq BIGINT NOT NULL DEFAULT 0")
+            )
+        for index in _EDITED_AT_INDEXES:
+            connection.execute(text(f"DROP INDEX IF EXISTS {index}"))
+    logger.info("change_seq added to {}", ", ".join(tables))
+
+
+def create_missing_indexes(engine: Engine) -> None:
+    """
+    The create_missing_indexes function creates the indexes declared in the models that
+    an existing database does not have yet: create_all skips tables that already exist.
+    """
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            # Операторы gin_trgm_ops для индексов поиска по записям
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+# Шаги по порядку; каждый сам проверяет, нужен ли он
+STEPS = (create_tables, migrate_tags_per_user, add_change_seq, create_missing_indexes)
+
+
+def main() -> None:
+    for step in STEPS:
+        step(engine)
+    logger.info("Database migrations finished")
+
+
+if __name__ == "__main__":
+    main()
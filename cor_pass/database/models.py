@@ -12,10 +12,13 @@ from sqlalchemy import (
     func,
     Boolean,
     LargeBinary,
+    Index,
+    BigInteger,
+    DDL,
+    event,
 )
 from sqlalchemy.orm import declarative_base, relationship, Mapped
 from sqlalchemy.sql.sqltypes import DateTime
-from cor_pass.database.db import engine
 
 Base = declarative_base()
 
@@ -25,6 +28,12 @@ class Status(enum.Enum):
     basic: str = "basic"
 
 
+class OutboxStatus(enum.Enum):
+    pending: str = "pending"
+    sent: str = "sent"
+    dead: str = "dead"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -78,16 +87,68 @@ class Record(Base):
         DateTime, nullable=False, default=func.now(), onupdate=func.now()
     )
     notes = Column(Text, nullable=True)
+    change_seq = Column(
+        BigInteger, nullable=False, default=0
+    )  # версия хранилища пользователя (VaultVersion) на момент последнего изменения
 
     user = relationship("User", back_populates="user_records")
     tags = relationship("Tag", secondary="records_tags")
 
+    __table_args__ = (
+        # Выборка изменений с курсора: /records/changes
+        Index("ix_records_user_change_seq", "user_id", "change_seq", "record_id"),
+        # Поиск подстроки (ILIKE '%...%') в /records/search, только PostgreSQL
+        Index(
+            "ix_records_name_trgm",
+            "record_name",
+            postgresql_using="gin",
+            postgresql_ops={"record_name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_records_website_trgm",
+            "website",
+            postgresql_using="gin",
+            postgresql_ops={"website": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+class RecordTombstone(Base):
+    __tablename__ = "record_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String(36), nullable=False)
+    record_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, nullable=False, default=func.now())
+    change_seq = Column(BigInteger, nullable=False, default=0)  # как у Record
+
+    __table_args__ = (
+        Index("ix_record_tombstones_user_change_seq", "user_id", "change_seq", "id"),
+    )
+
 
 class Tag(Base):
     __tablename__ = "tags"
 
     id = Column(Integer, primary_key=True)
-    name = Column(String(50), unique=True, nullable=False)
+    user_id = Column(
+        String(36), nullable=True
+    )  # тэги у каждого пользователя свои; NULL - тэг старой общей схемы без записей
+    name = Column(String(50), nullable=False)
+    usage_count = Column(
+        Integer, nullable=False, default=0
+    )  # число записей с тэгом, меняется в той же транзакции, что и записи
+
+    # /tags/mine читает только индекс (PostgreSQL: index-only scan)
+    __table_args__ = (
+        Index(
+            "ix_tags_user_name",
+            "user_id",
+            "name",
+            unique=True,
+            postgresql_include=["id", "usage_count"],
+        ),
+    )
 
 
 class RecordTag(Base):
@@ -127,4 +188,41 @@ class OTP(Base):
     user = relationship("User", back_populates="user_otp")
 
 
-Base.metadata.create_all(bind=engine)
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)  # шаблон письма, см. services/email.py
+    recipient = Column(String(250), nullable=False)
+    payload = Column(
+        Text, nullable=True
+    )  # поля шаблона, JSON зашифрован AES-GCM; очищается после отправки
+    status = Column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.pending)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)  # UTC
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_email_outbox_due", "status", "next_attempt_at"),)
+
+
+class VaultVersion(Base):
+    __tablename__ = "vault_versions"
+
+    scope = Column(
+        String(36), primary_key=True
+    )  # id пользователя: записи, тэги, OTP, настройки
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+# Операторы gin_trgm_ops для индексов поиска по записям
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+# Таблицы создает и изменяет python -m cor_pass.database.migrations, один раз до старта
+# воркеров: create_all при импорте гонялся бы между воркерами gunicorn
@@ -1,8 +1,11 @@
+from sqlalchemy import any_, bindparam, select, String
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Session
 import datetime
 from cor_pass.database.models import User
 from cor_pass.schemas import CreateCorIdModel
 from cor_pass.services.logger import logger
+from cor_pass.services import cor_id_codec
 
 from cor_pass.config.config import settings
 from datetime import datetime
@@ -32,49 +35,11 @@ def transform_integer(n):
 
 
 def to_base36(n_days, n_facility, n_patient):
-    num = int(f"{n_days}{n_facility}{n_patient}")
-    chars = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    result = []
-    while num > 0:
-        num, remainder = divmod(num, 36)
-        result.append(chars[remainder])
-    return "".join(reversed(result))
+    return cor_id_codec.to_base36(int(f"{n_days}{n_facility}{n_patient}"))
 
 
 def display_corid_info(corid):
-    try:
-        base36_str, suffix = corid.split("-")
-    except ValueError:
-        raise ValueError("Cor-ID format is invalid. Expected a '-'.")
-
-    chars = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    num = 0
-    for char in base36_str:
-        if char not in chars:
-            raise ValueError(f"Invalid character '{char}' in Cor-ID.")
-        num = num * 36 + chars.index(char)
-
-    n_str = f"{num:011d}"
-    if len(n_str) < 11:
-        raise ValueError("Decoded number is too short.")
-
-    n_patient = n_str[-5:]
-    n_facility = n_str[-10:-5]
-    n_days = n_str[:-10] or "0"
-
-    try:
-        birth_year = int(suffix[:-1])
-        sex = suffix[-1]
-    except ValueError:
-        raise ValueError("Invalid birth year or sex in Cor-ID suffix.")
-
-    return {
-        "n_days_since_first_jan_2024": int(n_days),
-        "n_facility": int(n_facility),
-        "n_patient": int(n_patient),
-        "birth_year": birth_year,
-        "sex": sex,
-    }
+    return cor_id_codec.decode(corid)
 
 
 async def create_corid(user: User, db: Session):
@@ -95,3 +60,24 @@ async def create_corid(user: User, db: Session):
     except Exception as e:
         db.rollback()
         raise e
+
+
+def resolve_cor_ids(cor_ids: list, db: Session):
+    """
+    The resolve_cor_ids function looks up many Cor-IDs with one query against the unique
+    index on users.cor_id. On PostgreSQL the ids are sent as one array parameter
+    (cor_id = ANY(:cor_ids)), so the statement text is the same for any batch size.
+    The function is synchronous: it is iterated from the streaming response thread.
+
+    :param cor_ids: list: Distinct Cor-IDs
+    :param db: Session: The database session
+    :return: A result yielding (cor_id, account_status, is_active) rows in batches
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        condition = User.cor_id == any_(
+            bindparam("cor_ids", cor_ids, type_=ARRAY(String))
+        )
+    else:
+        condition = User.cor_id.in_(cor_ids)
+    statement = select(User.cor_id, User.account_status, User.is_active).where(condition)
+    return db.execute(statement.execution_options(yield_per=1000))
@@ -0,0 +1,132 @@
+"""
+Очередь исходящих писем (transactional outbox)
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+
+from cryptography.exceptions import InvalidTag
+from sqlalchemy.orm import Session
+
+from cor_pass.config.config import settings
+from cor_pass.database.db import SessionLocal
+from cor_pass.database.models import EmailOutbox, OutboxStatus
+from cor_pass.services.cipher import aead_encrypt, aead_decrypt_many
+from cor_pass.services.logger import logger
+
+_PAYLOAD_KEY = hashlib.sha256(settings.aes_key.encode()).digest()
+_PAYLOAD_AAD = b"email_outbox"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def enqueue_email(db: Session, kind: str, recipient: str, fields: dict) -> None:
+    """
+    Adds a message to the outbox in the caller's transaction; it is sent only if the
+    caller commits. The template fields (codes) are stored encrypted.
+
+    :param db: Session: The database session of the request
+    :param kind: str: The message kind, a key of services.email.TEMPLATES
+    :param recipient: str: The recipient address
+    :param fields: dict: The template fields
+    :return: None
+    """
+    db.add(
+        EmailOutbox(
+            kind=kind,
+            recipient=recipient,
+            payload=aead_encrypt(json.dumps(fields), _PAYLOAD_KEY, _PAYLOAD_AAD),
+            status=OutboxStatus.pending,
+            attempts=0,
+            next_attempt_at=_utcnow(),
+        )
+    )
+
+
+# Функции ниже синхронные: диспетчер вызывает их через asyncio.to_thread
+# с собственной сессией, чтобы не блокировать event loop
+
+
+def claim_due_emails(batch_size: int, lease_seconds: int) -> list:
+    """
+    Takes up to batch_size due messages and leases them for lease_seconds. Rows locked by
+    another worker are skipped (FOR UPDATE SKIP LOCKED); a message whose worker died
+    becomes due again when its lease ends.
+
+    Rows whose payload cannot be decrypted or parsed are marked dead with the error
+    instead of being returned.
+
+    :return: A list of (id, kind, recipient, fields, attempts) tuples
+    """
+    now = _utcnow()
+    with SessionLocal() as db:
+        rows = (
+            db.query(EmailOutbox)
+            .filter(
+                EmailOutbox.status == OutboxStatus.pending,
+                EmailOutbox.next_attempt_at <= now,
+            )
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not rows:
+            return []
+        lease_until = now + timedelta(seconds=lease_seconds)
+        for row in rows:
+            row.attempts += 1
+            row.next_attempt_at = lease_until
+        claimed = []
+        for row in rows:
+            # Испорченное письмо не должно останавливать очередь: оно сразу уходит в dead
+            try:
+                payload = aead_decrypt_many([row.payload], _PAYLOAD_KEY, _PAYLOAD_AAD)[0]
+                fields = json.loads(payload)
+            except (InvalidTag, TypeError, ValueError) as e:
+                row.status = OutboxStatus.dead
+                row.last_error = f"Payload cannot be decoded: {e!r}"
+                logger.error("Email {} payload cannot be decoded", row.id)
+                continue
+            claimed.append((row.id, row.kind, row.recipient, fields, row.attempts))
+        db.commit()
+    return claimed
+
+
+def record_results(results: list) -> None:
+    """
+    Stores the outcome of a dispatched batch in one transaction.
+    Sent messages drop their payload; failed ones are retried with exponential backoff
+    and dead-lettered after settings.mail_max_attempts attempts or a permanent error
+    (the payload is kept so a dead message can be requeued by hand).
+
+    :param results: list: (id, attempts, error, permanent) tuples, error is None on success
+    :return: None
+    """
+    now = _utcnow()
+    with SessionLocal() as db:
+        rows = {
+            row.id: row
+            for row in db.query(EmailOutbox).filter(
+                EmailOutbox.id.in_([result[0] for result in results])
+            )
+        }
+        for message_id, attempts, error, permanent in results:
+            row = rows.get(message_id)
+            if row is None:
+                continue
+            if error is None:
+                row.status = OutboxStatus.sent
+                row.sent_at = now
+                row.payload = None
+                row.last_error = None
+            elif permanent or attempts >= settings.mail_max_attempts:
+                row.status = OutboxStatus.dead
+                row.last_error = error
+            else:
+                delay = min(settings.mail_retry_base_delay * 2 ** (attempts - 1), 3600)
+                row.next_attempt_at = now + timedelta(seconds=delay)
+                row.last_error = error
+        db.commit()
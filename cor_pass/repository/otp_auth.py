@@ -6,7 +6,14 @@ from cor_pass.database.models import User, OTP
 from cor_pass.schemas import CreateOTPRecordModel, UpdateOTPRecordModel
 from cor_pass.repository.person import get_user_by_uuid
 from cor_pass.config.config import settings
-from cor_pass.services.cipher import encrypt_data, decrypt_data, decrypt_user_key
+from cor_pass.services.cipher import (
+    encrypt_secret,
+    decrypt_secrets,
+    decrypt_user_key,
+    is_aead_encrypted,
+)
+from cor_pass.repository.vault_version import bump_version
+from cor_pass.services.logger import logger
 import os
 
 
@@ -17,13 +24,15 @@ async def create_otp_record(body: CreateOTPRecordModel, db: Session, user: User)
         record_name=body.record_name,
         user_id=user.id,
         username=body.username,
-        # private_key=await encrypt_data(
-        #     data=body.private_key, key=await decrypt_user_key(user.unique_cipher_key)
-        # ),
-        private_key=body.private_key,
+        private_key=await encrypt_secret(
+            data=body.private_key,
+            key=await decrypt_user_key(user.unique_cipher_key),
+            aad=user.id.encode(),
+        ),
     )
 
     db.add(new_record)
+    bump_version(db, user.id)
     db.commit()
     db.refresh(new_record)
     return new_record
@@ -45,6 +54,63 @@ async def get_all_user_otp_records(db: Session, user_id: str, skip: int, limit:
     return records
 
 
+async def decrypt_otp_secrets(user: User, records: list) -> list:
+    """
+    Decrypts the private keys of the given otp records of one user.
+    The user key is unwrapped once and all secrets are decrypted in one batch.
+
+    :param user: User: The owner of the records
+    :param records: list: OTP records
+    :return: The plaintext secrets in the order of records
+    """
+    if not records:
+        return []
+    values = [record.private_key for record in records]
+    if not any(is_aead_encrypted(value) for value in values):
+        return values
+    key = await decrypt_user_key(user.unique_cipher_key)
+    return await decrypt_secrets(values, key, aad=user.id.encode())
+
+
+async def encrypt_plaintext_otp_secrets(db: Session, batch_size: int = 500) -> int:
+    """
+    Encrypts otp secrets that are still stored in plaintext, batch_size rows per transaction.
+    Safe to re-run: already encrypted rows are skipped.
+
+    :param db: Session: The database session
+    :param batch_size: int: Rows per batch
+    :return: The number of encrypted rows
+    """
+    encrypted = 0
+    last_record_id = 0
+    user_keys = {}
+    while True:
+        rows = (
+            db.query(OTP, User.unique_cipher_key)
+            .join(User, OTP.user_id == User.id)
+            .filter(OTP.record_id > last_record_id)
+            .order_by(OTP.record_id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return encrypted
+        for record, unique_cipher_key in rows:
+            if record.private_key and not is_aead_encrypted(record.private_key):
+                key = user_keys.get(record.user_id)
+                if key is None:
+                    key = user_keys[record.user_id] = await decrypt_user_key(
+                        unique_cipher_key
+                    )
+                record.private_key = await encrypt_secret(
+                    data=record.private_key, key=key, aad=record.user_id.encode()
+                )
+                encrypted += 1
+        db.commit()
+        last_record_id = rows[-1][0].record_id
+        user_keys.clear()
+
+
 async def update_otp_record(
     record_id: int, body: UpdateOTPRecordModel, user: User, db: Session
 ):
@@ -57,6 +123,7 @@ async def update_otp_record(
     if record:
         record.record_name = body.record_name
         record.username = body.username
+        bump_version(db, user.id)
         db.commit()
         db.refresh(record)
     return record
@@ -74,6 +141,7 @@ async def delete_otp_record(user: User, db: Session, record_id: int):
         return None
     if record:
         db.delete(record)
+        bump_version(db, user.id)
         db.commit()
-        print("Record deleted")
+        logger.debug("OTP record {} deleted", record_id)
     return record
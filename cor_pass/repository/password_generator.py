@@ -1,13 +1,49 @@
+import math
 import string
 import secrets
+from typing import List
+
 from cor_pass.schemas import PasswordGeneratorSettings, WordPasswordGeneratorSettings
-from cor_pass.services import words
+from cor_pass.services import words, wordlists
 
 
 WORDS_LIST = words.word_list
 
+# Таблицы слов строятся один раз при импорте
+LOWERCASE_WORDS = tuple(
+    word for word in WORDS_LIST if word[0] in string.ascii_lowercase
+)
+CAPITALIZED_WORDS = tuple(word.capitalize() for word in LOWERCASE_WORDS)
 
-def generate_password(settings: PasswordGeneratorSettings) -> str:
+_INDEX_FORMATS = {1: "B", 2: "H", 4: "I"}
+
+
+def random_indexes(upper: int, count: int) -> List[int]:
+    """
+    The random_indexes function returns count uniformly distributed integers in [0, upper).
+    All randomness comes from a single secrets.token_bytes call sized for the expected
+    rejections; it is topped up only in the rare case the rejections exceed that.
+    Values at or above the largest multiple of upper are rejected, so there is no modulo bias.
+
+    :param upper: int: The exclusive upper bound
+    :param count: int: How many integers to draw
+    :return: A list of count integers
+    """
+    width = 1 if upper <= 1 << 8 else 2 if upper <= 1 << 16 else 4
+    span = 1 << (8 * width)
+    limit = span - span % upper
+    result = []
+    while len(result) < count:
+        missing = count - len(result)
+        # Ожидаемое число попыток на значение - span / limit, плюс запас
+        draws = missing * span // limit + 8
+        pool = memoryview(secrets.token_bytes(draws * width)).cast(_INDEX_FORMATS[width])
+        result.extend(value % upper for value in pool if value < limit)
+    del result[count:]
+    return result
+
+
+def generate_passwords(settings: PasswordGeneratorSettings) -> List[str]:
     characters = ""
     if settings.include_uppercase:
         characters += string.ascii_uppercase
@@ -21,10 +57,25 @@ def generate_password(settings: PasswordGeneratorSettings) -> str:
     if not characters:
         raise ValueError("No characters available for password generation.")
 
-    return "".join(secrets.choice(characters) for _ in range(settings.length))
+    length = settings.length
+    indexes = random_indexes(len(characters), settings.count * length)
+    return [
+        "".join(characters[index] for index in indexes[start : start + length])
+        for start in range(0, len(indexes), length)
+    ]
 
 
-def generate_word_password(settings: WordPasswordGeneratorSettings):
+def generate_password(settings: PasswordGeneratorSettings) -> str:
+    return generate_passwords(settings)[0]
+
+
+def generate_word_passwords(settings: WordPasswordGeneratorSettings) -> List[str]:
+    """
+    The generate_word_passwords function builds settings.count passphrases from the
+    built-in en-basic list or an installed wordlist.
+
+    :raises UnknownWordlist: If settings.wordlist is not installed
+    """
     if settings.separator_hyphen:
         separator = "-"
     elif settings.separator_underscore:
@@ -32,13 +83,40 @@ def generate_word_password(settings: WordPasswordGeneratorSettings):
     else:
         separator = ""
 
-    filtered_words = [word for word in WORDS_LIST if word[0] in string.ascii_lowercase]
-    if not settings.include_uppercase:
-        words_list = filtered_words
+    length = settings.length
+    builtin = settings.wordlist == wordlists.DEFAULT_WORDLIST
+    if builtin:
+        words_list = CAPITALIZED_WORDS if settings.include_uppercase else LOWERCASE_WORDS
     else:
-        words_list = [word.capitalize() for word in filtered_words]
+        words_list = wordlists.get_wordlist(settings.wordlist)
+    indexes = random_indexes(len(words_list), settings.count * length)
+    # Из большого словаря читаются и декодируются только выбранные слова
+    selected = [words_list[index] for index in indexes]
+    if settings.include_uppercase and not builtin:
+        selected = [word.capitalize() for word in selected]
+    return [
+        separator.join(selected[start : start + length])
+        for start in range(0, len(selected), length)
+    ]
+
+
+def generate_word_password(settings: WordPasswordGeneratorSettings) -> str:
+    return generate_word_passwords(settings)[0]
+
 
-    password = separator.join(
-        secrets.choice(words_list) for _ in range(settings.length)
-    )
-    return password
+def list_wordlists() -> List[dict]:
+    available = [
+        {
+            "name": wordlists.DEFAULT_WORDLIST,
+            "words": len(LOWERCASE_WORDS),
+            "bits_per_word": math.log2(len(LOWERCASE_WORDS)),
+        }
+    ]
+    for name in wordlists.installed_wordlists():
+        if name == wordlists.DEFAULT_WORDLIST:
+            continue
+        wordlist = wordlists.get_wordlist(name)
+        available.append(
+            {"name": name, "words": len(wordlist), "bits_per_word": wordlist.bits_per_word}
+        )
+    return available
@@ -1,9 +1,9 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.future import select
-from sqlalchemy import func
+from sqlalchemy import delete, func
 import uuid
 
-from cor_pass.database.models import User, Status, Verification, UserSettings
+from cor_pass.database.models import User, Status, Tag, Verification, UserSettings
 from cor_pass.schemas import UserModel, PasswordStorageSettings, MedicalStorageSettings
 from cor_pass.services.auth import auth_service
 from cor_pass.services.logger import logger
@@ -13,7 +13,9 @@ from cor_pass.services.cipher import (
     generate_recovery_code,
     encrypt_data,
 )
-from cor_pass.services.email import send_email_code_with_qr
+from cor_pass.services.email import email_dispatcher
+from cor_pass.repository.email_outbox import enqueue_email
+from cor_pass.repository.vault_version import bump_version
 from sqlalchemy.exc import NoResultFound
 
 
@@ -76,8 +78,11 @@ async def create_user(body: UserModel, db: Session) -> User:
     new_user.account_status = Status.basic
     new_user.unique_cipher_key = await generate_aes_key()  # ->bytes
     new_user.recovery_code = await generate_recovery_code()
-    await send_email_code_with_qr(
-        new_user.email, host=None, recovery_code=new_user.recovery_code
+    await enqueue_email(
+        db,
+        "recovery_code",
+        new_user.email,
+        {"host": None, "recovery_code": new_user.recovery_code},
     )
     encrypted_recovery_code = await encrypt_data(
         data=new_user.recovery_code, key=new_user.unique_cipher_key
@@ -95,6 +100,7 @@ async def create_user(body: UserModel, db: Session) -> User:
         db.commit()
         db.refresh(new_user)
         db.refresh(user_settings)
+        email_dispatcher.notify()
         return new_user
     except Exception as e:
         db.rollback()
@@ -249,6 +255,9 @@ async def delete_user_by_email(db: Session, email: str):
     try:
         user = db.query(User).filter(User.email == email).one()  
         db.delete(user)  
+        # Связи records_tags удаляются вместе с записями, после них - тэги
+        db.flush()
+        db.execute(delete(Tag).where(Tag.user_id == user.id))
         db.commit()  
     except NoResultFound:
         print("Пользователь не найден.")
@@ -259,7 +268,7 @@ async def delete_user_by_email(db: Session, email: str):
 
 async def get_settings(user: User, db: Session):
     user_settings = (
-        db.query(UserSettings).join(User, UserSettings.user_id == User.id).first()
+        db.query(UserSettings).filter(UserSettings.user_id == user.id).first()
     )
     if user_settings:
         return user_settings
@@ -294,11 +303,14 @@ async def change_password_storage_settings(
     current_user: User, settings: PasswordStorageSettings, db: Session
 ) -> None:
     user_settings = (
-        db.query(UserSettings).join(User, UserSettings.user_id == User.id).first()
+        db.query(UserSettings)
+        .filter(UserSettings.user_id == current_user.id)
+        .first()
     )
     if user_settings:
         user_settings.local_password_storage = settings.local_password_storage
         user_settings.cloud_password_storage = settings.cloud_password_storage
+        bump_version(db, current_user.id)
         db.commit()
         db.refresh(user_settings)
     else:
@@ -309,6 +321,7 @@ async def change_password_storage_settings(
         user_settings.cloud_password_storage = settings.cloud_password_storage
         try:
             db.add(user_settings)
+            bump_version(db, current_user.id)
             db.commit()
             db.refresh(user_settings)
             logger.debug("Created new user_settings")
@@ -322,11 +335,14 @@ async def change_medical_storage_settings(
     current_user: User, settings: MedicalStorageSettings, db: Session
 ) -> None:
     user_settings = (
-        db.query(UserSettings).join(User, UserSettings.user_id == User.id).first()
+        db.query(UserSettings)
+        .filter(UserSettings.user_id == current_user.id)
+        .first()
     )
     if user_settings:
         user_settings.local_medical_storage = settings.local_medical_storage
         user_settings.cloud_medical_storage = settings.cloud_medical_storage
+        bump_version(db, current_user.id)
         db.commit()
         db.refresh(user_settings)
     else:
@@ -337,6 +353,7 @@ async def change_medical_storage_settings(
         user_settings.cloud_medical_storage = settings.cloud_medical_storage
         try:
             db.add(user_settings)
+            bump_version(db, current_user.id)
             db.commit()
             db.refresh(user_settings)
             logger.debug("Created new user_settings")
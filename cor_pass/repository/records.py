@@ -1,15 +1,41 @@
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
+import base64
+import struct
+from collections import Counter
+from itertools import islice
+from typing import Iterable, List, NamedTuple
 
+from sqlalchemy import and_, bindparam, func, insert, or_, select, update
+from sqlalchemy.orm import Session, selectinload
 
-from cor_pass.database.models import User, Record, Tag
-from cor_pass.schemas import CreateRecordModel
+
+from cor_pass.database.models import User, Record, RecordTag, RecordTombstone, Tag
+from cor_pass.schemas import CreateRecordModel, RecordOperation, TagModel
 from cor_pass.repository.person import get_user_by_uuid
 from cor_pass.config.config import settings
-from cor_pass.services.cipher import encrypt_data, decrypt_data, decrypt_user_key
+from cor_pass.database.db import SessionLocal
+from cor_pass.services.cipher import (
+    encrypt_data,
+    decrypt_data,
+    decrypt_data_many,
+    decrypt_user_key,
+    encrypt_data_many,
+)
+from cor_pass.repository.tags import apply_usage, resolve_tags
+from cor_pass.repository.vault_version import bump_version
+from cor_pass.services.logger import logger
 import os
 
 
+def _replace_tags(record: Record, tags: list, deltas: Counter) -> None:
+    # Изменения usage_count копятся в deltas и применяются один раз перед commit
+    tags = list(dict.fromkeys(tags))
+    for tag in record.tags:
+        deltas[tag] -= 1
+    for tag in tags:
+        deltas[tag] += 1
+    record.tags = tags
+
+
 async def create_record(body: CreateRecordModel, db: Session, user: User) -> Record:
     if not user:
         raise Exception("User not found")
@@ -25,14 +51,13 @@ async def create_record(body: CreateRecordModel, db: Session, user: User) -> Rec
         ),
         notes=body.notes,
     )
-    if body.tag_names:
-        for tag_name in body.tag_names:
-            tag = db.query(Tag).filter_by(name=tag_name).first()
-            if not tag:
-                tag = Tag(name=tag_name)
-            new_record.tags.append(tag)
+    deltas = Counter()
+    tags = resolve_tags(db, user.id, body.tag_names)
+    _replace_tags(new_record, [tags[name] for name in body.tag_names], deltas)
+    apply_usage(deltas)
 
     db.add(new_record)
+    new_record.change_seq = bump_version(db, user.id)
     db.commit()
     db.refresh(new_record)
     return new_record
@@ -69,6 +94,65 @@ async def get_all_user_records(db: Session, user_id: str, skip: int, limit: int)
     return records
 
 
+def _like_pattern(query: str) -> str:
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+async def search_records(
+    db: Session,
+    user_id: str,
+    query: str | None,
+    tag_names: List[str],
+    after: int | None,
+    limit: int,
+) -> dict:
+    """
+    The search_records function finds the records of a user whose name or website contains
+    query (case-insensitive) and that carry all of tag_names. On PostgreSQL the substring
+    match is served by the pg_trgm indexes of records; elsewhere it is a scan of the
+    user's records. Pages are keyset-paginated by record_id.
+
+    :param db: Session: The database session
+    :param user_id: str: The owner of the records
+    :param query: str | None: The text to look for, None - match by tags only
+    :param tag_names: List[str]: Tags every found record must have
+    :param after: int | None: next_after of the previous page
+    :param limit: int: Records per page
+    :return: A dict with the records and the next_after cursor (None on the last page)
+    """
+    statement = (
+        select(Record)
+        .where(Record.user_id == user_id)
+        .options(selectinload(Record.tags))
+        .order_by(Record.record_id)
+        .limit(limit + 1)
+    )
+    if query:
+        pattern = _like_pattern(query)
+        statement = statement.where(
+            or_(
+                Record.record_name.ilike(pattern, escape="\\"),
+                Record.website.ilike(pattern, escape="\\"),
+            )
+        )
+    tag_names = set(tag_names)
+    if tag_names:
+        tagged = (
+            select(RecordTag.record_id)
+            .join(Tag, Tag.id == RecordTag.tag_id)
+            .where(Tag.user_id == user_id, Tag.name.in_(tag_names))
+            .group_by(RecordTag.record_id)
+            .having(func.count() == len(tag_names))
+        )
+        statement = statement.where(Record.record_id.in_(tagged))
+    if after is not None:
+        statement = statement.where(Record.record_id > after)
+    records = db.scalars(statement).all()
+    next_after = records[limit - 1].record_id if len(records) > limit else None
+    return {"records": records[:limit], "next_after": next_after}
+
+
 async def update_record(
     record_id: int, body: CreateRecordModel, user: User, db: Session
 ):
@@ -88,17 +172,12 @@ async def update_record(
             data=body.password, key=await decrypt_user_key(user.unique_cipher_key)
         )
         record.notes = body.notes
-        tags_copy = list(record.tags)
-
-        for tag in tags_copy:
-            record.tags.remove(tag)
-
-        if body.tag_names:
-            for tag_name in body.tag_names:
-                tag = db.query(Tag).filter_by(name=tag_name).first()
-                if not tag:
-                    tag = Tag(name=tag_name)
-                record.tags.append(tag)
+        deltas = Counter()
+        tags = resolve_tags(db, user.id, body.tag_names)
+        _replace_tags(record, [tags[name] for name in body.tag_names], deltas)
+        apply_usage(deltas)
+        # Новый change_seq меняет строку и при изменении только тэгов
+        record.change_seq = bump_version(db, user.id)
         db.commit()
         db.refresh(record)
     return record
@@ -115,7 +194,390 @@ async def delete_record(user: User, db: Session, record_id: int):
     if not record:
         return None
     if record:
+        deltas = Counter()
+        _replace_tags(record, [], deltas)
+        apply_usage(deltas)
         db.delete(record)
+        db.add(
+            RecordTombstone(
+                user_id=user.id,
+                record_id=record.record_id,
+                change_seq=bump_version(db, user.id),
+            )
+        )
         db.commit()
-        print("Record deleted")
+        logger.debug("Record {} deleted", record_id)
     return record
+
+
+async def apply_record_batch(
+    db: Session, user: User, operations: List[RecordOperation], create_limit: int | None
+) -> list:
+    """
+    The apply_record_batch function applies a list of create / update / delete / retag
+    operations in one transaction. Ownership of every referenced record is checked with
+    one query, all tag names are resolved with one query and the user key is unwrapped
+    once. An operation on a record that does not exist (or was deleted earlier in the
+    batch) fails on its own and does not stop the others.
+
+    :param db: Session: The database session
+    :param user: User: The owner of the records
+    :param operations: List[RecordOperation]: The operations in order
+    :param create_limit: int | None: How many records may be created, None - no limit
+    :return: A list of result dicts in the order of operations
+    """
+    record_ids = {operation.record_id for operation in operations if operation.record_id}
+    records = {
+        record.record_id: record
+        for record in db.scalars(
+            select(Record)
+            .where(Record.user_id == user.id, Record.record_id.in_(record_ids))
+            .options(selectinload(Record.tags))
+        )
+    }
+    tag_names = set()
+    for operation in operations:
+        tag_names.update(operation.tag_names or ())
+        if operation.record is not None:
+            tag_names.update(operation.record.tag_names)
+    tags = resolve_tags(db, user.id, tag_names)
+    key = await decrypt_user_key(user.unique_cipher_key)
+
+    results = []
+    created = []
+    changed = []  # записи и надгробия, получающие change_seq
+    deltas = Counter()
+    for operation in operations:
+        result = {"op": operation.op, "record_id": operation.record_id, "status": 200}
+        results.append(result)
+        body = operation.record
+        if operation.op == "create":
+            if create_limit is not None and len(created) >= create_limit:
+                result.update(status=402, detail="User is not premium")
+                continue
+            record = Record(user_id=user.id)
+            db.add(record)
+            created.append((result, record))
+            result["status"] = 201
+        else:
+            record = records.get(operation.record_id)
+            if record is None:
+                result.update(status=404, detail="Record not found")
+                continue
+        if operation.op == "delete":
+            _replace_tags(record, [], deltas)
+            db.delete(record)
+            tombstone = RecordTombstone(user_id=user.id, record_id=record.record_id)
+            db.add(tombstone)
+            changed.append(tombstone)
+            del records[record.record_id]
+            continue
+        if body is not None:
+            username, password = encrypt_data_many([body.username, body.password], key)
+            record.record_name = body.record_name
+            record.website = body.website
+            record.username = username
+            record.password = password
+            record.notes = body.notes
+        tag_names = operation.tag_names if body is None else body.tag_names
+        _replace_tags(record, [tags[name] for name in tag_names], deltas)
+        changed.append(record)
+
+    if any(result["status"] < 400 for result in results):
+        apply_usage(deltas)
+        change_seq = bump_version(db, user.id)
+        for row in changed:
+            row.change_seq = change_seq
+        db.flush()
+        for result, record in created:
+            result["record_id"] = record.record_id
+        db.commit()
+    return results
+
+
+def iter_export_batches(user_id: str, key: bytes, batch_size: int = 500):
+    """
+    The iter_export_batches function reads all records of a user through a server-side
+    cursor, batch_size rows at a time, and yields each batch decrypted with the already
+    unwrapped key. Only one batch is held in memory.
+    It is synchronous and opens its own session: it runs in the thread pool of a
+    streaming response, after the request's session has been closed.
+
+    :param user_id: str: The owner of the records
+    :param key: bytes: The unwrapped user key
+    :param batch_size: int: Rows per batch
+    :return: An iterator of lists of plain dicts
+    """
+    with SessionLocal() as db:
+        result = db.execute(
+            select(Record)
+            .where(Record.user_id == user_id)
+            .options(selectinload(Record.tags))
+            .order_by(Record.record_id)
+            .execution_options(yield_per=batch_size)
+        )
+        for records in result.scalars().partitions():
+            usernames = decrypt_data_many([record.username for record in records], key)
+            passwords = decrypt_data_many([record.password for record in records], key)
+            yield [
+                {
+                    "record_id": record.record_id,
+                    "record_name": record.record_name,
+                    "website": record.website,
+                    "username": username,
+                    "password": password,
+                    "notes": record.notes,
+                    "tags": [tag.name for tag in record.tags],
+                    "created_at": record.created_at.isoformat(),
+                    "edited_at": record.edited_at.isoformat(),
+                }
+                for record, username, password in zip(records, usernames, passwords)
+            ]
+            db.expunge_all()
+
+
+async def count_user_records(db: Session, user_id: str) -> int:
+    return db.scalar(select(func.count(Record.record_id)).where(Record.user_id == user_id))
+
+
+def _max_length(model, field: str) -> int:
+    return next(
+        constraint.max_length
+        for constraint in model.model_fields[field].metadata
+        if hasattr(constraint, "max_length")
+    )
+
+
+# Импортированные записи проходят те же ограничения, что и созданные через API
+_NAME_LENGTH = _max_length(CreateRecordModel, "record_name")
+_TAG_LENGTH = _max_length(TagModel, "name")
+_WEBSITE_LENGTH = 250  # схема website не ограничивает, это ширина колонки
+_CREDENTIAL_LENGTH = 159  # байт: base64(iv + AES-CBC) не длиннее 250 символов
+_MAX_REPORTED_ERRORS = 20
+
+
+def _import_batch(
+    db: Session, user_id: str, key: bytes, entries: list, tag_ids: dict, change_seq: int
+) -> None:
+    usernames = encrypt_data_many([entry["username"] for entry in entries], key)
+    passwords = encrypt_data_many([entry["password"] for entry in entries], key)
+    tag_names = {name for entry in entries for name in entry["tags"]} - tag_ids.keys()
+    if tag_names:
+        tag_ids.update(
+            db.execute(
+                select(Tag.name, Tag.id).where(Tag.user_id == user_id, Tag.name.in_(tag_names))
+            ).all()
+        )
+        missing = [
+            {"user_id": user_id, "name": name, "usage_count": 0}
+            for name in tag_names - tag_ids.keys()
+        ]
+        if missing:
+            tag_ids.update(
+                db.execute(
+                    insert(Tag).returning(Tag.name, Tag.id, sort_by_parameter_order=True),
+                    missing,
+                ).all()
+            )
+    record_ids = db.scalars(
+        insert(Record).returning(Record.record_id, sort_by_parameter_order=True),
+        [
+            {
+                "user_id": user_id,
+                "record_name": entry["record_name"][:_NAME_LENGTH],
+                "website": entry["website"][:_WEBSITE_LENGTH],
+                "username": username,
+                "password": password,
+                "notes": entry["notes"],
+                "change_seq": change_seq,
+            }
+            for entry, username, password in zip(entries, usernames, passwords)
+        ],
+    ).all()
+    links = [
+        {"record_id": record_id, "tag_id": tag_ids[name]}
+        for record_id, entry in zip(record_ids, entries)
+        for name in entry["tags"]
+    ]
+    if links:
+        db.execute(insert(RecordTag), links)
+        usage = Counter(link["tag_id"] for link in links)
+        db.execute(
+            update(Tag.__table__)
+            .where(Tag.id == bindparam("tag_id"))
+            .values(usage_count=Tag.usage_count + bindparam("delta")),
+            [{"tag_id": tag_id, "delta": delta} for tag_id, delta in usage.items()],
+        )
+
+
+def import_records(
+    user_id: str, key: bytes, entries: Iterable, limit: int, batch_size: int = 500
+) -> dict:
+    """
+    The import_records function stores parsed import entries batch_size at a time:
+    each batch is encrypted with the already unwrapped key, inserted with multi-row
+    INSERTs and committed, so memory use does not depend on the file size and a failure
+    keeps the batches stored before it.
+    It is synchronous and opens its own session: it runs in the thread pool.
+
+    :param user_id: str: The owner of the records
+    :param key: bytes: The unwrapped user key
+    :param entries: Iterable: (line, entry, error) tuples from vault_import.parse_entries
+    :param limit: int: How many records may be imported
+    :param batch_size: int: Entries per transaction
+    :return: A summary: imported and skipped counts and the first errors
+    """
+    summary = {"imported": 0, "skipped": 0, "errors": []}
+
+    def skip(line, error):
+        summary["skipped"] += 1
+        if len(summary["errors"]) < _MAX_REPORTED_ERRORS:
+            summary["errors"].append({"line": line, "error": error})
+
+    entries = iter(entries)
+    tag_ids = {}
+    with SessionLocal() as db:
+        while True:
+            try:
+                chunk = list(islice(entries, batch_size))
+            except ValueError as e:
+                # Файл дальше не читается; сохраненные пакеты остаются
+                summary["errors"].append({"line": None, "error": str(e)})
+                break
+            if not chunk:
+                break
+            batch = []
+            for line, entry, error in chunk:
+                if entry is None:
+                    skip(line, error)
+                elif summary["imported"] + len(batch) >= limit:
+                    skip(line, "Record limit reached")
+                else:
+                    entry["tags"] = list(
+                        dict.fromkeys(name[:_TAG_LENGTH] for name in entry["tags"])
+                    )
+                    batch.append((line, entry))
+            if not batch:
+                continue
+            stored = []
+            for line, entry in batch:
+                if (
+                    len(entry["username"].encode()) > _CREDENTIAL_LENGTH
+                    or len(entry["password"].encode()) > _CREDENTIAL_LENGTH
+                ):
+                    skip(line, "Username or password is too long")
+                else:
+                    stored.append(entry)
+            if stored:
+                change_seq = bump_version(db, user_id)
+                _import_batch(db, user_id, key, stored, tag_ids, change_seq)
+                db.commit()
+                summary["imported"] += len(stored)
+                logger.debug("Imported {} records", summary["imported"])
+    logger.info(
+        "Import finished: {} imported, {} skipped", summary["imported"], summary["skipped"]
+    )
+    return summary
+
+
+_CURSOR = struct.Struct("<Bqqqq")
+_CURSOR_VERSION = 2
+
+
+class SyncCursor(NamedTuple):
+    """
+    Position of a client in the change feed: the (change_seq, record_id) of the last
+    record it received and the (change_seq, id) of the last tombstone. change_seq is the
+    vault version of the write, which grows in commit order, so a write committed after
+    a cursor was issued always sorts after it. Sent as 44 base64url chars.
+    """
+
+    record_seq: int
+    record_id: int
+    tombstone_seq: int
+    tombstone_id: int
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(_CURSOR.pack(_CURSOR_VERSION, *self)).decode()
+
+    @classmethod
+    def decode(cls, cursor: str) -> "SyncCursor":
+        """
+        :raises ValueError: If the cursor is malformed or of an older version
+        """
+        try:
+            version, *position = _CURSOR.unpack(base64.urlsafe_b64decode(cursor.encode()))
+        except (struct.error, ValueError):
+            raise ValueError("Invalid cursor")
+        if version != _CURSOR_VERSION:
+            raise ValueError("Invalid cursor")
+        return cls(*position)
+
+
+async def get_record_changes(
+    db: Session, user_id: str, since: SyncCursor | None, limit: int
+) -> dict:
+    """
+    The get_record_changes function returns the records created or edited after the
+    cursor and the ids of the records deleted after it, at most limit of each.
+    Both reads are range scans on the (user_id, change_seq) indexes, so the cost
+    depends on the number of changes, not on the size of the vault.
+    Without a cursor every record is returned and earlier deletions are skipped.
+
+    :param db: Session: The database session
+    :param user_id: str: The owner of the records
+    :param since: SyncCursor | None: The cursor returned by the previous call
+    :param limit: int: The maximum number of records and of deletions
+    :return: A dict with records, deleted, cursor and has_more
+    """
+    if since is None:
+        last_tombstone = db.execute(
+            select(RecordTombstone.change_seq, RecordTombstone.id)
+            .where(RecordTombstone.user_id == user_id)
+            .order_by(RecordTombstone.change_seq.desc(), RecordTombstone.id.desc())
+            .limit(1)
+        ).first()
+        since = SyncCursor(0, 0, *(last_tombstone or (0, 0)))
+
+    records = (
+        db.query(Record)
+        .options(selectinload(Record.tags))
+        .filter(
+            Record.user_id == user_id,
+            Record.change_seq >= since.record_seq,
+            or_(Record.change_seq > since.record_seq, Record.record_id > since.record_id),
+        )
+        .order_by(Record.change_seq, Record.record_id)
+        .limit(limit + 1)
+        .all()
+    )
+    tombstones = (
+        db.query(RecordTombstone.change_seq, RecordTombstone.id, RecordTombstone.record_id)
+        .filter(
+            RecordTombstone.user_id == user_id,
+            RecordTombstone.change_seq >= since.tombstone_seq,
+            or_(
+                RecordTombstone.change_seq > since.tombstone_seq,
+                RecordTombstone.id > since.tombstone_id,
+            ),
+        )
+        .order_by(RecordTombstone.change_seq, RecordTombstone.id)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(records) > limit or len(tombstones) > limit
+    records, tombstones = records[:limit], tombstones[:limit]
+
+    record_seq, record_id = since.record_seq, since.record_id
+    if records:
+        record_seq, record_id = records[-1].change_seq, records[-1].record_id
+    tombstone_seq, tombstone_id = since.tombstone_seq, since.tombstone_id
+    if tombstones:
+        tombstone_seq, tombstone_id = tombstones[-1].change_seq, tombstones[-1].id
+    cursor = SyncCursor(record_seq, record_id, tombstone_seq, tombstone_id)
+    return {
+        "records": records,
+        "deleted": [tombstone.record_id for tombstone in tombstones],
+        "cursor": cursor.encode(),
+        "has_more": has_more,
+    }
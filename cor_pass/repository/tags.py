@@ -1,77 +1,179 @@
-from typing import List
+from collections import Counter
+from typing import Iterable, List
 
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session
 
-from cor_pass.database.models import Tag
+from cor_pass.database.models import Record, RecordTag, Tag
 from cor_pass.schemas import TagModel, TagResponse
+from cor_pass.repository.vault_version import bump_version
 
 
-async def get_tags(skip: int, limit: int, db: Session) -> List[Tag]:
+def resolve_tags(db: Session, user_id: str, names: Iterable[str]) -> dict:
     """
-    Get a list of tags from the database.
+    Find the tags of a user by name with one query; the missing ones are created.
 
+    :param db: The database session used to interact with the database.
+    :param user_id: The owner of the tags.
+    :param names: The tag names.
+    :return: A dict of tag name -> tag object.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    tags = {
+        tag.name: tag
+        for tag in db.scalars(
+            select(Tag).where(Tag.user_id == user_id, Tag.name.in_(names))
+        )
+    }
+    for name in names - tags.keys():
+        tags[name] = Tag(user_id=user_id, name=name, usage_count=0)
+        db.add(tags[name])
+    return tags
+
+
+def apply_usage(deltas: Counter) -> None:
+    """
+    Apply the changes of usage_count collected while records were tagged and untagged.
+    Existing tags are updated with usage_count = usage_count + delta, so concurrent
+    writes of the same user do not overwrite each other's counts.
+
+    :param deltas: A Counter of tag object -> change of its usage count.
+    """
+    for tag, delta in deltas.items():
+        if not delta:
+            continue
+        if tag.id is None:
+            tag.usage_count += delta
+        else:
+            tag.usage_count = Tag.usage_count + delta
+
+
+async def get_tags(user_id: str, skip: int, limit: int, db: Session) -> List[Tag]:
+    """
+    Get a list of tags of a user from the database.
+
+    :param user_id: The owner of the tags.
     :param skip: The number of tags to skip.
     :param limit: The maximum number of tags to retrieve.
     :param db: The database session used to interact with the database.
     :return: A list of tag objects.
     """
-    tags = db.query(Tag).offset(skip).limit(limit).all()
+    tags = (
+        db.query(Tag)
+        .filter(Tag.user_id == user_id)
+        .order_by(Tag.name)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
     tag_dicts = [{"name": tag.name, "id": tag.id} for tag in tags]
     return tag_dicts
 
 
-async def get_tag(tag_id: int, db: Session) -> Tag:
+async def get_tag_usage(user_id: str, db: Session) -> list:
+    """
+    Get the tag cloud of a user: every tag with the number of records carrying it.
+    The query reads only the (user_id, name) index of tags.
+
+    :param user_id: The owner of the tags.
+    :param db: The database session used to interact with the database.
+    :return: A list of (id, name, usage_count) rows ordered by name.
+    """
+    return db.execute(
+        select(Tag.id, Tag.name, Tag.usage_count)
+        .where(Tag.user_id == user_id)
+        .order_by(Tag.name)
+    ).all()
+
+
+async def get_tag(user_id: str, tag_id: int, db: Session) -> Tag:
     """
-    Get a tag from the database by its ID.
+    Get a tag of a user from the database by its ID.
 
+    :param user_id: The owner of the tag.
     :param tag_id: The ID of the tag to retrieve.
     :param db: The database session used to interact with the database.
     :return: The retrieved tag object.
     """
-    return db.query(Tag).filter(Tag.id == tag_id).first()
+    return db.query(Tag).filter(Tag.id == tag_id, Tag.user_id == user_id).first()
+
+
+async def get_tag_by_name(user_id: str, name: str, db: Session) -> Tag:
+    """
+    Get a tag of a user from the database by its name.
+
+    :param user_id: The owner of the tag.
+    :param name: The name of the tag.
+    :param db: The database session used to interact with the database.
+    :return: The retrieved tag object.
+    """
+    return db.query(Tag).filter(Tag.user_id == user_id, Tag.name == name).first()
 
 
-async def create_tag(body: TagModel, db: Session) -> TagResponse:
+async def create_tag(user_id: str, body: TagModel, db: Session) -> TagResponse:
     """
-    Create a new tag in the database.
+    Create a new tag of a user in the database.
 
+    :param user_id: The owner of the tag.
     :param body: The tag data used to create the tag.
     :param db: The database session used to interact with the database.
     :return: The created tag response object.
     """
-    tag = Tag(name=body.name)
+    tag = Tag(user_id=user_id, name=body.name, usage_count=0)
     db.add(tag)
+    bump_version(db, user_id)
     db.commit()
     db.refresh(tag)
     return TagResponse(id=tag.id, name=tag.name)
 
 
-async def update_tag(tag_id: int, body: TagModel, db: Session) -> Tag | None:
+def _touch_tagged_records(db: Session, tag_id: int, change_seq: int) -> None:
+    # Тэги записей изменились: записи должны попасть в /records/changes
+    db.execute(
+        update(Record)
+        .where(
+            Record.record_id.in_(
+                select(RecordTag.record_id).where(RecordTag.tag_id == tag_id)
+            )
+        )
+        .values(change_seq=change_seq)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def update_tag(user_id: str, tag_id: int, body: TagModel, db: Session) -> Tag | None:
     """
-    Update an existing tag in the database.
+    Rename a tag of a user in the database.
 
+    :param user_id: The owner of the tag.
     :param tag_id: The ID of the tag to update.
     :param body: The updated tag data.
     :param db: The database session used to interact with the database.
     :return: The updated tag object if found, else None.
     """
-    tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    tag = await get_tag(user_id, tag_id, db)
     if tag:
         tag.name = body.name
+        _touch_tagged_records(db, tag.id, bump_version(db, user_id))
         db.commit()
     return tag
 
 
-async def remove_tag(tag_id: int, db: Session) -> Tag | None:
+async def remove_tag(user_id: str, tag_id: int, db: Session) -> Tag | None:
     """
-    Remove a tag from the database.
+    Remove a tag of a user from the database, together with its record links.
 
+    :param user_id: The owner of the tag.
     :param tag_id: The ID of the tag to remove.
     :param db: The database session used to interact with the database.
     :return: The removed tag object if found, else None.
     """
-    tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    tag = await get_tag(user_id, tag_id, db)
     if tag:
+        _touch_tagged_records(db, tag.id, bump_version(db, user_id))
+        db.execute(delete(RecordTag).where(RecordTag.tag_id == tag.id))
         db.delete(tag)
         db.commit()
     return tag
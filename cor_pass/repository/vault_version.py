@@ -0,0 +1,57 @@
+"""
+Счетчики версий данных пользователя для условных GET-запросов (ETag)
+"""
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from cor_pass.database.models import VaultVersion
+
+_UPSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+
+def bump_version(db: Session, scope: str) -> int:
+    """
+    The bump_version function increments the version of a scope in the caller's
+    transaction, so the new version becomes visible together with the write it marks.
+    Call it before the caller's commit.
+
+    The version row stays locked until the caller commits, so writes of one user get
+    increasing versions in commit order; records and tombstones are stamped with it
+    (change_seq) for the change feed.
+
+    :param db: Session: The database session of the write
+    :param scope: str: A user id
+    :return: The new version
+    """
+    insert = _UPSERTS.get(db.get_bind().dialect.name)
+    if insert is not None:
+        return db.scalar(
+            insert(VaultVersion)
+            .values(scope=scope, version=1)
+            .on_conflict_do_update(
+                index_elements=[VaultVersion.scope],
+                set_={"version": VaultVersion.version + 1},
+            )
+            .returning(VaultVersion.version)
+        )
+    updated = db.execute(
+        update(VaultVersion)
+        .where(VaultVersion.scope == scope)
+        .values(version=VaultVersion.version + 1)
+    ).rowcount
+    if not updated:
+        db.add(VaultVersion(scope=scope, version=1))
+        # Сразу в БД: повторный вызов в той же транзакции должен найти строку
+        db.flush()
+        return 1
+    return db.scalar(select(VaultVersion.version).where(VaultVersion.scope == scope))
+
+
+async def get_version(db: Session, scope: str) -> int:
+    """
+    The get_version function returns the current version of a scope, 0 if it was never written.
+    """
+    version = db.scalar(select(VaultVersion.version).where(VaultVersion.scope == scope))
+    return version or 0
@@ -8,6 +8,7 @@ from cor_pass.services.access import user_access, admin_access
 from cor_pass.schemas import UserDb
 from cor_pass.repository import person
 from pydantic import EmailStr
+from cor_pass.services.serializers import users_serializer
 
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
@@ -33,7 +34,7 @@ async def get_all_users(
     :rtype: List[UserDb]
     """
     list_users = await person.get_users(skip, limit, db)
-    return list_users
+    return users_serializer.response(list_users)
 
 
 @router.patch("/asign_status/{account_status}", dependencies=[Depends(admin_access)])
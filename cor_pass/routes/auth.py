@@ -4,7 +4,6 @@ from fastapi import (
     Depends,
     status,
     Security,
-    BackgroundTasks,
     Request,
     File,
     Form,
@@ -32,10 +31,8 @@ from cor_pass.database.models import User
 from cor_pass.repository import person as repository_person
 from cor_pass.repository import cor_id as repository_cor_id
 from cor_pass.services.auth import auth_service
-from cor_pass.services.email import (
-    send_email_code,
-    send_email_code_forgot_password,
-)
+from cor_pass.services.email import email_dispatcher
+from cor_pass.repository.email_outbox import enqueue_email
 from cor_pass.services.cipher import decrypt_data, decrypt_user_key, encrypt_data
 from cor_pass.config.config import settings
 from cor_pass.services.logger import logger
@@ -73,7 +70,7 @@ async def signup(
     """
     exist_user = await repository_person.get_user_by_email(body.email, db)
     if exist_user:
-        logger.debug(f"{body.email} user already exist")
+        logger.debug("{} user already exist", body.email)
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="Account already exists"
         )
@@ -81,7 +78,7 @@ async def signup(
     new_user = await repository_person.create_user(body, db)
     if not new_user.cor_id:
         await repository_cor_id.create_corid(new_user, db)
-    logger.debug(f"{body.email} user successfully created")
+    logger.debug("{} user successfully created", body.email)
     return {"user": new_user, "detail": "User successfully created"}
 
 
@@ -176,7 +173,7 @@ async def refresh_token(
     user.refresh_token = refresh_token
     db.commit()
     await repository_person.update_token(user, refresh_token, db)
-    logger.debug(f"{user.email}'s refresh token updated")
+    logger.debug("{}'s refresh token updated", user.email)
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -189,7 +186,6 @@ async def refresh_token(
 )  # Маршрут проверки почты в случае если это новая регистрация
 async def send_verification_code(
     body: EmailSchema,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: Session = Depends(get_db),
 ):
@@ -202,20 +198,25 @@ async def send_verification_code(
     exist_user = await repository_person.get_user_by_email(body.email, db)
     if exist_user:
 
-        logger.debug(f"{body.email}Account already exists")
+        logger.debug("{}Account already exists", body.email)
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Account already exists",
         )
 
     if exist_user == None:
-        background_tasks.add_task(
-            send_email_code, body.email, request.base_url, verification_code
+        await enqueue_email(
+            db,
+            "verification",
+            body.email,
+            {"host": str(request.base_url), "code": verification_code},
         )
-        logger.debug("Check your email for verification code.")
+        # Письмо и код сохраняются одним коммитом
         await repository_person.write_verification_code(
             email=body.email, db=db, verification_code=verification_code
         )
+        email_dispatcher.notify()
+        logger.debug("Check your email for verification code.")
 
     return {"message": "Check your email for verification code."}
 
@@ -233,13 +234,13 @@ async def confirm_email(body: VerificationModel, db: Session = Depends(get_db)):
     confirmation = False
     if ver_code:
         confirmation = True
-        logger.debug(f"Your {body.email} is confirmed")
+        logger.debug("Your {} is confirmed", body.email)
         return {
             "message": "Your email is confirmed",  # Сообщение для JS о том что имейл подтвержден
             "confirmation": confirmation,
         }
     else:
-        logger.debug(f"{body.email} - Invalid verification code")
+        logger.debug("{} - Invalid verification code", body.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid verification code"
         )
@@ -248,7 +249,6 @@ async def confirm_email(body: VerificationModel, db: Session = Depends(get_db)):
 @router.post("/forgot_password")
 async def forgot_password_send_verification_code(
     body: EmailSchema,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: Session = Depends(get_db),
 ):
@@ -263,16 +263,18 @@ async def forgot_password_send_verification_code(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
     if exist_user:
-        background_tasks.add_task(
-            send_email_code_forgot_password,
+        await enqueue_email(
+            db,
+            "forgot_password",
             body.email,
-            request.base_url,
-            verification_code,
+            {"host": str(request.base_url), "code": verification_code},
         )
+        # Письмо и код сохраняются одним коммитом
         await repository_person.write_verification_code(
             email=body.email, db=db, verification_code=verification_code
         )
-        logger.debug(f"{body.email} - Check your email for verification code.")
+        email_dispatcher.notify()
+        logger.debug("{} - Check your email for verification code.", body.email)
     return {"message": "Check your email for verification code."}
 
 
@@ -315,7 +317,7 @@ async def restore_account_by_text(
             data={"oid": user.cor_id}
         )
         await repository_person.update_token(user, refresh_token, db)
-        logger.debug(f"{user.email}  login success")
+        logger.debug("{}  login success", user.email)
         return {
             "access_token": access_token,
             "refresh_token": refresh_token,
@@ -324,7 +326,7 @@ async def restore_account_by_text(
             "confirmation": confirmation,
         }
     else:
-        logger.debug(f"{body.email} - Invalid recovery code")
+        logger.debug("{} - Invalid recovery code", body.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid recovery code"
         )
@@ -365,7 +367,7 @@ async def upload_recovery_file(
             data={"oid": user.cor_id}
         )
         await repository_person.update_token(user, refresh_token, db)
-        logger.debug(f"{user.email}  login success")
+        logger.debug("{}  login success", user.email)
         return {
             "access_token": access_token,
             "refresh_token": refresh_token,
@@ -374,7 +376,7 @@ async def upload_recovery_file(
             "confirmation": confirmation,
         }
     else:
-        logger.debug(f"{email} - Invalid recovery code")
+        logger.debug("{} - Invalid recovery code", email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid recovery code"
         )
@@ -1,11 +1,15 @@
+import json
+
 from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from cor_pass.database.db import get_db
+from cor_pass.database.db import get_db, SessionLocal
 from cor_pass.services.auth import auth_service
 from cor_pass.database.models import User
-from cor_pass.services.access import user_access
-from cor_pass.schemas import ResponseCorIdModel, CreateCorIdModel
+from cor_pass.services.access import user_access, admin_access
+from cor_pass.schemas import ResponseCorIdModel, CreateCorIdModel, CorIdBatchModel
+from cor_pass.services import cor_id_codec
 from cor_pass.repository import cor_id as repository_cor_id
 
 
@@ -27,10 +31,63 @@ async def read_cor_id(
 
     """
     if cor_id:
-        cor_id = repository_cor_id.display_corid_info(cor_id.cor_id)
+        try:
+            cor_id = repository_cor_id.display_corid_info(cor_id.cor_id)
+        except cor_id_codec.InvalidCorId as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     if cor_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="COR-Id not found"
         )
     return cor_id
 
+
+@router.post("/decode_batch", dependencies=[Depends(user_access)])
+async def decode_cor_id_batch(
+    body: CorIdBatchModel,
+    user: User = Depends(auth_service.get_current_user),
+):
+    """
+    **Пакетная расшифровка COR-id** \n
+    До 10000 COR-id за запрос. Результаты идут в порядке запроса; для некорректного
+    COR-id вместо данных возвращается поле error.
+    """
+    return cor_id_codec.decode_many(body.cor_ids)
+
+
+def _resolve_lines(cor_ids: list):
+    # Своя сессия: зависимость get_db закрывается до начала отправки тела ответа
+    with SessionLocal() as db:
+        missing = set(cor_ids)
+        for cor_id, account_status, is_active in repository_cor_id.resolve_cor_ids(
+            cor_ids, db
+        ):
+            missing.discard(cor_id)
+            yield json.dumps(
+                {
+                    "cor_id": cor_id,
+                    "exists": True,
+                    # status - nullable колонка с default только на стороне Python
+                    "account_status": account_status.value if account_status else None,
+                    "is_active": is_active,
+                }
+            ) + "\n"
+    for cor_id in cor_ids:
+        if cor_id in missing:
+            yield json.dumps({"cor_id": cor_id, "exists": False}) + "\n"
+
+
+@router.post("/resolve_batch", dependencies=[Depends(admin_access)])
+async def resolve_cor_id_batch(body: CorIdBatchModel):
+    """
+    **Пакетная проверка COR-id** \n
+    До 10000 COR-id за запрос, один запрос к БД по уникальному индексу.
+    Ответ - NDJSON, строка на каждый COR-id: сначала найденные (с account_status и
+    is_active) по мере чтения из БД, затем ненайденные с exists=false.\n
+    Level of Access:
+    - Administrator
+    """
+    cor_ids = list(dict.fromkeys(body.cor_ids))
+    return StreamingResponse(
+        _resolve_lines(cor_ids), media_type="application/x-ndjson"
+    )
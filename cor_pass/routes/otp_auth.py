@@ -1,14 +1,29 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+import asyncio
+import time
+from contextlib import suppress
+
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Depends,
+    Header,
+    status,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from sqlalchemy.orm import Session
 from typing import List
 
 from cor_pass.repository import records as repository_record
 from cor_pass.repository import otp_auth as repository_otp_auth
-from cor_pass.database.db import get_db
+from cor_pass.repository import vault_version as repository_vault_version
+from cor_pass.database.db import get_db, SessionLocal
 from cor_pass.schemas import (
     CreateOTPRecordModel,
     OTPRecordResponse,
     UpdateOTPRecordModel,
+    VerifyOTPModel,
+    VerifyOTPResponse,
 )
 from cor_pass.database.models import User
 from cor_pass.config.config import settings
@@ -16,6 +31,13 @@ from cor_pass.services.auth import auth_service
 from cor_pass.services.logger import logger
 from cor_pass.services.access import user_access
 from cor_pass.services import cor_otp
+from cor_pass.services.serializers import otp_records_serializer
+from cor_pass.services.http_cache import (
+    etag_matches,
+    make_etag,
+    not_modified,
+    validator_headers,
+)
 
 
 router = APIRouter(prefix="/otp_auth", tags=["OTP-Authentication"])
@@ -28,11 +50,14 @@ encryption_key = settings.encryption_key
 async def read_otp_records(
     skip: int = 0,
     limit: int = 150,
+    if_none_match: str | None = Header(None),
     user: User = Depends(auth_service.get_current_user),
     db: Session = Depends(get_db),
 ):
     """
     **Get a list of otp_records. / Получение всех otp записей пользователя** \n
+    The weak ETag covers the vault version and the current TOTP window: a matching
+    If-None-Match gets 304 until a record changes or the codes roll over.
 
     :param skip: The number of otp records to skip (for pagination). Default is 0.
     :type skip: int
@@ -43,6 +68,13 @@ async def read_otp_records(
     :return: A list of OTPRecordResponse objects representing the records.
     :rtype: List[OTPRecordResponse]
     """
+    version = await repository_vault_version.get_version(db, user.id)
+    window = int(time.time() // cor_otp.INTERVAL)
+    headers = validator_headers(
+        make_etag("otp", user.id, version, window, skip, limit, weak=True)
+    )
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
     try:
         otp_records = await repository_otp_auth.get_all_user_otp_records(
             db, user.id, skip, limit
@@ -50,21 +82,125 @@ async def read_otp_records(
     except Exception as e:
         logger.error(f"Database query failed: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
-    otp_records_with_codes = []
-    for record in otp_records:
-        otp_password, remaining_time = cor_otp.generate_and_verify_otp(
-            record.private_key
-        )
-        otp_record_response = OTPRecordResponse(
-            record_id=record.record_id,
-            record_name=record.record_name,
-            username=record.username,
-            otp_password=otp_password,
-            remaining_time=remaining_time,
+    private_keys = await repository_otp_auth.decrypt_otp_secrets(user, otp_records)
+    otp_passwords, remaining_time = cor_otp.totp_engine.generate_many(
+        private_keys, keys=[(record.record_id, version) for record in otp_records]
+    )
+    return otp_records_serializer.response(
+        [
+            {
+                "record_id": record.record_id,
+                "record_name": record.record_name,
+                "username": record.username,
+                "otp_password": otp_password,
+                "remaining_time": remaining_time,
+            }
+            for record, otp_password in zip(otp_records, otp_passwords)
+        ],
+        headers=headers,
+    )
+
+
+# Секунд на первое сообщение с токеном после открытия соединения
+STREAM_AUTH_TIMEOUT = 10
+
+
+async def _authenticate_stream(websocket: WebSocket) -> User | None:
+    try:
+        message = await asyncio.wait_for(websocket.receive_json(), STREAM_AUTH_TIMEOUT)
+        token = message["token"]
+    except (asyncio.TimeoutError, ValueError, KeyError, TypeError):
+        return None
+    with SessionLocal() as db:
+        try:
+            user = await auth_service.get_user_from_token(token, db)
+        except HTTPException:
+            return None
+    return user if user.is_active else None
+
+
+async def _load_stream_page(
+    user: User, skip: int, limit: int, loaded_version: int | None
+) -> tuple[int, list | None]:
+    # Сессия только на время чтения: соединение может жить часами
+    with SessionLocal() as db:
+        version = await repository_vault_version.get_version(db, user.id)
+        if version == loaded_version:
+            return version, None
+        otp_records = await repository_otp_auth.get_all_user_otp_records(
+            db, user.id, skip, limit
         )
-        otp_records_with_codes.append(otp_record_response)
+    private_keys = await repository_otp_auth.decrypt_otp_secrets(user, otp_records)
+    return version, [
+        (record.record_id, record.record_name, record.username, private_key)
+        for record, private_key in zip(otp_records, private_keys)
+    ]
+
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
 
-    return otp_records_with_codes
+@router.websocket("/stream")
+async def stream_otp_records(websocket: WebSocket, skip: int = 0, limit: int = 150):
+    """
+    **Поток otp кодов пользователя по WebSocket** \n
+    The first message must be ``{"token": "<access token>"}``: the token is not taken from
+    the query string, which access logs record. A list of OTPRecordResponse objects is pushed
+    right away and again at every TOTP window boundary, driven by one shared timer per
+    worker. The records are reloaded when the vault version changes.
+    Closes with 1008 if the token is missing or invalid and with 1011 on a server error.
+    """
+    await websocket.accept()
+    user = await _authenticate_stream(websocket)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    # Клиент после токена ничего не шлет: receive нужен, чтобы заметить отключение
+    disconnected = asyncio.create_task(_wait_disconnect(websocket))
+    try:
+        version, otp_records = None, []
+        while True:
+            version, reloaded = await _load_stream_page(user, skip, limit, version)
+            if reloaded is not None:
+                otp_records = reloaded
+            otp_passwords, remaining_time = cor_otp.totp_engine.generate_many(
+                [private_key for *_, private_key in otp_records],
+                keys=[(record_id, version) for record_id, *_ in otp_records],
+            )
+            await websocket.send_json(
+                [
+                    OTPRecordResponse(
+                        record_id=record_id,
+                        record_name=record_name,
+                        username=username,
+                        otp_password=otp_password,
+                        remaining_time=remaining_time,
+                    ).model_dump()
+                    for (record_id, record_name, username, _), otp_password in zip(
+                        otp_records, otp_passwords
+                    )
+                ]
+            )
+            next_window = asyncio.create_task(cor_otp.window_ticker.wait_next_window())
+            await asyncio.wait(
+                (next_window, disconnected), return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected.done():
+                next_window.cancel()
+                disconnected.result()
+                break
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.opt(exception=e).error("OTP stream failed for {}", user.id)
+        # Клиент мог уже закрыть соединение
+        with suppress(Exception):
+            await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+    finally:
+        disconnected.cancel()
+    logger.debug("OTP stream closed for {}", user.id)
 
 
 @router.get(
@@ -93,9 +229,8 @@ async def read_otp_record(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Record not found"
         )
-    otp_password, remaining_time = cor_otp.generate_and_verify_otp(
-        otp_record.private_key
-    )
+    (private_key,) = await repository_otp_auth.decrypt_otp_secrets(user, [otp_record])
+    otp_password, remaining_time = cor_otp.generate_and_verify_otp(private_key)
 
     return OTPRecordResponse(
         record_id=otp_record.record_id,
@@ -128,9 +263,7 @@ async def create_otp_record(
     :rtype: OTPRecordResponse
     """
     otp_record = await repository_otp_auth.create_otp_record(body, db, user)
-    otp_password, remaining_time = cor_otp.generate_and_verify_otp(
-        otp_record.private_key
-    )
+    otp_password, remaining_time = cor_otp.generate_and_verify_otp(body.private_key)
 
     return OTPRecordResponse(
         record_id=otp_record.record_id,
@@ -141,6 +274,44 @@ async def create_otp_record(
     )
 
 
+@router.post(
+    "/{otp_record_id}/verify",
+    response_model=VerifyOTPResponse,
+    dependencies=[Depends(user_access)],
+)
+async def verify_otp_code(
+    otp_record_id: int,
+    body: VerifyOTPModel,
+    user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    **Verify a code against an otp record. / Проверка otp кода** \n
+    The code is accepted within ±settings.otp_verify_drift windows; a code that was
+    already accepted is rejected until its window leaves that range.
+
+    :param otp_record_id: The ID of the otp record.
+    :type otp_record_id: int
+    :param body: The request body containing the code.
+    :type body: VerifyOTPModel
+    :param db: The database session. Dependency on get_db.
+    :type db: Session, optional
+    :return: Whether the code is valid.
+    :rtype: VerifyOTPResponse
+    :raises HTTPException 404: If the otp record with the specified ID does not exist.
+    """
+    otp_record = await repository_otp_auth.get_otp_record_by_id(user, db, otp_record_id)
+    if otp_record is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Record not found"
+        )
+    (private_key,) = await repository_otp_auth.decrypt_otp_secrets(user, [otp_record])
+    valid, detail = await cor_otp.verify_otp(
+        otp_record.record_id, private_key, body.code
+    )
+    return VerifyOTPResponse(valid=valid, detail=detail)
+
+
 """
 Маршрут обновления otp записи
 """
@@ -177,9 +348,8 @@ async def update_otp_record(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Record not found"
         )
-    otp_password, remaining_time = cor_otp.generate_and_verify_otp(
-        otp_record.private_key
-    )
+    (private_key,) = await repository_otp_auth.decrypt_otp_secrets(user, [otp_record])
+    otp_password, remaining_time = cor_otp.generate_and_verify_otp(private_key)
 
     return OTPRecordResponse(
         record_id=otp_record.record_id,
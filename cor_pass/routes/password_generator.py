@@ -1,35 +1,17 @@
-from fastapi import APIRouter, status
-from cor_pass.schemas import PasswordGeneratorSettings, WordPasswordGeneratorSettings
+from typing import List
 
-from prometheus_client import start_http_server, Summary
-from prometheus_client import Counter, Histogram
-from prometheus_client import generate_latest
-from starlette.responses import Response
-
-from cor_pass.repository import password_generator as repository_password_generator
-
-# Счетчик запросов на генерацию пароля
-password_generator_requests_total = Counter(
-    "password_generator_requests_total", "Total number of password generation requests"
-)
-
-# Гистограмма времени обработки запросов на генерацию пароля
-password_generator_request_duration = Histogram(
-    "password_generator_request_duration_seconds",
-    "Duration of password generation requests in seconds",
+from fastapi import APIRouter, HTTPException, status
+from cor_pass.schemas import (
+    BreachCheckModel,
+    BreachCheckResponse,
+    PasswordGeneratorSettings,
+    WordPasswordGeneratorSettings,
+    WordlistModel,
 )
+from cor_pass.services.wordlists import UnknownWordlist
+from cor_pass.services.breach_check import breach_index
 
-# Счетчик запросов на генерацию парольной фразы
-word_password_generator_requests_total = Counter(
-    "word_password_generator_requests_total",
-    "Total number of word password generation requests",
-)
-
-# Гистограмма времени обработки запросов на генерацию парольной фразы
-word_password_generator_request_duration = Histogram(
-    "word_password_generator_request_duration_seconds",
-    "Duration of word password generation requests in seconds",
-)
+from cor_pass.repository import password_generator as repository_password_generator
 
 
 router = APIRouter(prefix="/password_generator", tags=["Password Generator"])
@@ -39,19 +21,55 @@ router = APIRouter(prefix="/password_generator", tags=["Password Generator"])
 async def generate_password_endpoint(settings: PasswordGeneratorSettings):
     """
     **Генератор пароля** \n
+    При count > 1 возвращает список паролей в поле passwords.
     """
-    with password_generator_request_duration.time():
-        password_generator_requests_total.inc()
-        return {"password": repository_password_generator.generate_password(settings)}
+    passwords = repository_password_generator.generate_passwords(settings)
+    if settings.count == 1:
+        return {"password": passwords[0]}
+    return {"passwords": passwords}
 
 
 @router.post("/generate_word_password/", status_code=status.HTTP_201_CREATED)
 async def generate_word_password_endpoint(settings: WordPasswordGeneratorSettings):
     """
     **Генератор парольной фразы** \n
+    wordlist - имя словаря из /password_generator/wordlists (по умолчанию en-basic).
+    При count > 1 возвращает список фраз в поле passwords.
+    """
+    try:
+        passwords = repository_password_generator.generate_word_passwords(settings)
+    except UnknownWordlist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Wordlist not found"
+        )
+    if settings.count == 1:
+        return {"password": passwords[0]}
+    return {"passwords": passwords}
+
+
+@router.get("/wordlists", response_model=List[WordlistModel])
+async def get_wordlists():
+    """
+    **Доступные словари для парольных фраз** \n
+    bits_per_word - энтропия одного слова.
+    """
+    return repository_password_generator.list_wordlists()
+
+
+@router.post("/breach_check", response_model=BreachCheckResponse)
+async def breach_check(body: BreachCheckModel):
+    """
+    **Проверка пароля по базе утечек** \n
+    Проверка выполняется локально по индексу Pwned Passwords, без сетевых запросов.
+    Вместо пароля можно передать его SHA-1 в поле sha1.
     """
-    with word_password_generator_request_duration.time():
-        word_password_generator_requests_total.inc()
-        return {
-            "password": repository_password_generator.generate_word_password(settings)
-        }
+    if not breach_index.available:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Breach index is not installed",
+        )
+    if body.sha1 is not None:
+        breached = breach_index.contains_sha1(bytes.fromhex(body.sha1))
+    else:
+        breached = breach_index.contains_password(body.password)
+    return {"breached": breached}
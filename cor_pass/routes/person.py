@@ -1,10 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response, status
 from sqlalchemy.orm import Session
 
 from cor_pass.database.db import get_db
 from cor_pass.services.auth import auth_service
 from cor_pass.services.cipher import decrypt_data, decrypt_user_key
-from cor_pass.services.qr_code import generate_qr_code
+from cor_pass.services.qr_code import QR_FORMATS, generate_qr_code
+from cor_pass.services.http_cache import (
+    etag_matches,
+    make_etag,
+    not_modified,
+    validator_headers,
+)
 from cor_pass.services.recovery_file import generate_recovery_file
 from cor_pass.database.models import User, Status
 from cor_pass.services.access import user_access
@@ -18,9 +24,9 @@ from cor_pass.schemas import (
     ResponseCorIdModel,
 )
 from cor_pass.repository import person
+from cor_pass.repository import vault_version as repository_vault_version
 from cor_pass.repository import cor_id as repository_cor_id
 from pydantic import EmailStr
-from io import BytesIO
 from fastapi.responses import StreamingResponse
 
 router = APIRouter(prefix="/user", tags=["User"])
@@ -64,14 +70,22 @@ async def get_status(email: EmailStr, db: Session = Depends(get_db)):
 
 @router.get("/get_settings")
 async def get_user_settings(
+    response: Response,
+    if_none_match: str | None = Header(None),
     user: User = Depends(auth_service.get_current_user),
     db: Session = Depends(get_db),
 ):
     """
     **Получение настроек авторизированного пользователя**\n
+    Ответ содержит ETag: при неизменных настройках запрос с If-None-Match получает 304.\n
     Level of Access:
     - Current authorized user
     """
+    version = await repository_vault_version.get_version(db, user.id)
+    headers = validator_headers(make_etag("settings", user.id, version, weak=True))
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
+    response.headers.update(headers)
 
     settings = await person.get_settings(user, db)
     return {
@@ -153,7 +167,7 @@ async def change_email(
     else:
         if email:
             await person.change_user_email(email, user, db)
-            logger.debug(f"{current_user.id} - changed his email to {email}")
+            logger.debug("{} - changed his email to {}", current_user.id, email)
             return {"message": f"User '{current_user.id}' changed his email to {email}"}
         else:
             print("Incorrect email input")
@@ -181,7 +195,7 @@ async def add_backup_email(
     else:
         if email:
             await person.add_user_backup_email(email.email, user, db)
-            logger.debug(f"{current_user.id} - add his backup email")
+            logger.debug("{} - add his backup email", current_user.id)
             return {"message": f"{current_user.id} - add his backup email"}
         else:
             print("Incorrect email input")
@@ -206,7 +220,7 @@ async def change_password(body: ChangePasswordModel, db: Session = Depends(get_d
     else:
         if body.password:
             await person.change_user_password(body.email, body.password, db)
-            logger.debug(f"{body.email} - changed his password")
+            logger.debug("{} - changed his password", body.email)
             return {"message": f"User '{body.email}' changed his password"}
         else:
             print("Incorrect password input")
@@ -235,22 +249,32 @@ async def get_recovery_code(
 
 @router.get("/get_recovery_qr_code")
 async def get_recovery_qr_code(
+    image_format: str = Query("png", alias="format", pattern="^(png|svg)$"),
+    if_none_match: str | None = Header(None),
     user: User = Depends(auth_service.get_current_user),
     db: Session = Depends(get_db),
 ):
     """
     **Получения QR с кодом восстановления авторизированного пользователя**\n
+    Формат: png (по умолчанию) или svg.
+    Ответ содержит ETag: повторный запрос с If-None-Match получает 304 без расшифровки кода.\n
     Level of Access:
     - Current authorized user
     """
+    # ETag считается по зашифрованному значению: меняется вместе с кодом восстановления
+    headers = validator_headers(make_etag(user.recovery_code, image_format))
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
 
     recovery_code = await decrypt_data(
         encrypted_data=user.recovery_code,
         key=await decrypt_user_key(user.unique_cipher_key),
     )
-    recovery_qr_bytes = generate_qr_code(recovery_code)
-    recovery_qr = BytesIO(recovery_qr_bytes)
-    return StreamingResponse(recovery_qr, media_type="image/png")
+    return Response(
+        content=generate_qr_code(recovery_code, image_format),
+        media_type=QR_FORMATS[image_format],
+        headers=headers,
+    )
 
 
 @router.get("/get_recovery_file")
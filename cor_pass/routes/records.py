@@ -1,15 +1,51 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+import asyncio
+
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Depends,
+    File,
+    Header,
+    Query,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 
 from cor_pass.repository import records as repository_record
+from cor_pass.repository import vault_version as repository_vault_version
 from cor_pass.database.db import get_db
-from cor_pass.schemas import CreateRecordModel, RecordResponse
+from cor_pass.schemas import (
+    CreateRecordModel,
+    RecordBatchModel,
+    RecordBatchResponse,
+    RecordChangesResponse,
+    RecordImportResponse,
+    RecordResponse,
+    RecordSearchResponse,
+)
 from cor_pass.database.models import User
 from cor_pass.config.config import settings
 from cor_pass.services.auth import auth_service
 from cor_pass.services.logger import logger
 from cor_pass.services.access import user_access
+from cor_pass.services.breach_check import breach_index
+from cor_pass.services.cipher import decrypt_user_key
+from cor_pass.services import vault_export, vault_import
+from cor_pass.services.serializers import (
+    records_serializer,
+    record_changes_serializer,
+    record_search_serializer,
+)
+from cor_pass.services.http_cache import (
+    etag_matches,
+    make_etag,
+    not_modified,
+    validator_headers,
+)
 
 router = APIRouter(prefix="/records", tags=["Records"])
 encryption_key = settings.encryption_key
@@ -21,11 +57,14 @@ encryption_key = settings.encryption_key
 async def read_records(
     skip: int = 0,
     limit: int = 150,
+    if_none_match: str | None = Header(None),
     user: User = Depends(auth_service.get_current_user),
     db: Session = Depends(get_db),
 ):
     """
     **Get a list of records. / Получение всех записей пользователя** \n
+    The response carries a weak ETag of the vault version; a request with a matching
+    If-None-Match gets 304 without the records being read.
 
     :param skip: The number of records to skip (for pagination). Default is 0.
     :type skip: int
@@ -36,12 +75,222 @@ async def read_records(
     :return: A list of RecordModel objects representing the records.
     :rtype: List[RecordModel]
     """
+    version = await repository_vault_version.get_version(db, user.id)
+    headers = validator_headers(
+        make_etag("records", user.id, version, skip, limit, weak=True)
+    )
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
     try:
         records = await repository_record.get_all_user_records(db, user.id, skip, limit)
     except Exception as e:
         logger.error(f"Database query failed: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
-    return records
+    return records_serializer.response(records, headers=headers)
+
+
+@router.get(
+    "/changes",
+    response_model=RecordChangesResponse,
+    dependencies=[Depends(user_access)],
+)
+async def read_record_changes(
+    since: str | None = None,
+    limit: int = Query(500, ge=1, le=1000),
+    user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    **Get records changed since a cursor. / Изменения записей для локального хранилища** \n
+    Returns the records created or edited after the cursor (in the same form as /records/all)
+    and the ids of the deleted ones. Store the returned cursor and pass it as since next
+    time; while has_more is true, request again right away. Without since the whole vault
+    is returned.
+
+    :param since: The cursor from the previous response.
+    :type since: str, optional
+    :param limit: The maximum number of records (and of deletions) per response.
+    :type limit: int
+    :return: The changed records, the deleted record ids and the next cursor.
+    :rtype: RecordChangesResponse
+    :raises HTTPException 400: If the cursor is malformed.
+    """
+    cursor = None
+    if since:
+        try:
+            cursor = repository_record.SyncCursor.decode(since)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+            )
+    changes = await repository_record.get_record_changes(db, user.id, cursor, limit)
+    return record_changes_serializer.response(changes)
+
+
+@router.get(
+    "/search", response_model=RecordSearchResponse, dependencies=[Depends(user_access)]
+)
+async def search_records(
+    q: str | None = Query(None, min_length=1, max_length=250),
+    tag: List[str] = Query([]),
+    after: int | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    **Search records. / Поиск записей по названию, сайту и тэгам** \n
+    Finds records whose name or website contains q (case-insensitive) and that have
+    every given tag. Pass next_after of a page as after to get the next one.
+
+    :param q: The text to look for in the record name and website.
+    :type q: str
+    :param tag: A tag the records must have, may be repeated.
+    :type tag: List[str]
+    :param after: The next_after of the previous page.
+    :type after: int
+    :param limit: The maximum number of records per page. Default is 50.
+    :type limit: int
+    :return: The found records and the cursor of the next page.
+    :rtype: RecordSearchResponse
+    :raises HTTPException 400: If neither q nor tag is given.
+    """
+    if not q and not tag:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="q or tag is required"
+        )
+    result = await repository_record.search_records(db, user.id, q, tag, after, limit)
+    return record_search_serializer.response(result)
+
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "archive": ("application/octet-stream", "corpass"),
+}
+
+
+@router.get("/export", dependencies=[Depends(user_access)])
+async def export_records(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv|archive)$"),
+    x_export_passphrase: str | None = Header(None),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """
+    **Export all records. / Экспорт всех записей пользователя** \n
+    Streams every record with decrypted username and password as NDJSON (one record per
+    line), CSV, or an encrypted archive for offline backup. The archive is encrypted with
+    the passphrase from the X-Export-Passphrase header (at least 8 characters) and can be
+    opened with python -m cor_pass.services.vault_export decrypt.
+
+    :param export_format: ndjson (default), csv or archive.
+    :type export_format: str
+    :return: The export file.
+    :raises HTTPException 400: If an archive is requested without a valid passphrase.
+    """
+    if export_format == "archive" and (
+        not x_export_passphrase or len(x_export_passphrase) < 8
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="X-Export-Passphrase of at least 8 characters is required",
+        )
+    key = await decrypt_user_key(user.unique_cipher_key)
+    batches = repository_record.iter_export_batches(user.id, key)
+    if export_format == "csv":
+        chunks = vault_export.csv_chunks(batches)
+    elif export_format == "archive":
+        chunks = vault_export.archive_chunks(batches, x_export_passphrase)
+    else:
+        chunks = vault_export.ndjson_chunks(batches)
+    logger.info("Records export started, format {}", export_format)
+    media_type, extension = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="cor-pass-export.{extension}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@router.post(
+    "/import", response_model=RecordImportResponse, dependencies=[Depends(user_access)]
+)
+async def import_records(
+    file: UploadFile = File(...),
+    import_format: str = Query("auto", alias="format", pattern="^(auto|csv|json|ndjson)$"),
+    user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    **Import records from another password manager. / Импорт записей из файла** \n
+    Accepts CSV exports of Bitwarden, KeePass/KeePassXC and Chrome, Bitwarden JSON and
+    the NDJSON/CSV export of COR-Pass. The format is detected from the file name unless
+    given. Folders and groups become tags. Records are stored in batches; entries that
+    cannot be imported are skipped and reported.
+
+    :param file: The export file.
+    :type file: UploadFile
+    :param import_format: auto (default), csv, json or ndjson.
+    :type import_format: str
+    :return: The number of imported and skipped entries and the first errors.
+    :rtype: RecordImportResponse
+    :raises HTTPException 402: If a basic account has no records left.
+    """
+    limit = settings.import_max_records
+    if user.account_status.value == "basic":
+        count = await repository_record.count_user_records(db, user.id)
+        limit = min(limit, settings.basic_account_records - count)
+        if limit <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                detail="User is not premium",
+            )
+    key = await decrypt_user_key(user.unique_cipher_key)
+    entries = vault_import.parse_entries(file.file, file.filename, import_format)
+    logger.info("Records import started, format {}", import_format)
+    return await asyncio.to_thread(
+        repository_record.import_records,
+        user.id,
+        key,
+        entries,
+        limit,
+        settings.import_batch_size,
+    )
+
+
+@router.post(
+    "/batch", response_model=RecordBatchResponse, dependencies=[Depends(user_access)]
+)
+async def apply_record_batch(
+    body: RecordBatchModel,
+    user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    **Apply several record changes at once. / Пакетное изменение записей** \n
+    Operations (create, update, delete, retag) are applied in order in one transaction.
+    Each operation gets its own result: 201 or 200 on success, 404 if the record does not
+    exist, 402 if a basic account has no records left. A failed operation does not stop
+    the others.
+
+    :param body: Up to 500 operations.
+    :type body: RecordBatchModel
+    :return: The result of every operation, in order.
+    :rtype: RecordBatchResponse
+    """
+    create_limit = None
+    if user.account_status.value == "basic" and any(
+        operation.op == "create" for operation in body.operations
+    ):
+        count = await repository_record.count_user_records(db, user.id)
+        create_limit = max(0, settings.basic_account_records - count)
+    results = await repository_record.apply_record_batch(
+        db, user, body.operations, create_limit
+    )
+    return {"results": results}
 
 
 @router.get(
@@ -80,11 +329,14 @@ async def read_record(
 )
 async def create_record(
     body: CreateRecordModel,
+    response: Response,
     user: User = Depends(auth_service.get_current_user),
     db: Session = Depends(get_db),
 ):
     """
     **Create a new record. / Создание записи** \n
+    Если установлен индекс утечек, заголовок X-Password-Breached сообщает,
+    встречается ли пароль записи в известных утечках.
 
     :param body: The request body containing the record data.
     :type body: CreateRecordModel
@@ -93,6 +345,9 @@ async def create_record(
     :return: The created ResponseRecord object representing the new record.
     :rtype: ResponseRecord
     """
+    if body.password and breach_index.available:
+        breached = breach_index.contains_password(body.password)
+        response.headers["X-Password-Breached"] = "true" if breached else "false"
     if user.account_status.value == "basic":
         records = await repository_record.get_all_user_records(db, user.id, 0, 50)
         if len(records) < settings.basic_account_records:
@@ -1,19 +1,37 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Header, status
 from sqlalchemy.orm import Session
 
 from cor_pass.database.db import get_db
-from cor_pass.schemas import TagModel, TagResponse
+from cor_pass.database.models import User
+from cor_pass.schemas import TagModel, TagResponse, TagUsageResponse
 from cor_pass.repository import tags as repository_tags
+from cor_pass.repository import vault_version as repository_vault_version
+from cor_pass.services.access import user_access
+from cor_pass.services.auth import auth_service
+from cor_pass.services.serializers import tag_usage_serializer, tags_serializer
+from cor_pass.services.http_cache import (
+    etag_matches,
+    make_etag,
+    not_modified,
+    validator_headers,
+)
 
 router = APIRouter(prefix="/tags", tags=["Tags"])
 
 
-@router.get("/", response_model=List[TagResponse])
-async def read_tags(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
+@router.get("/", response_model=List[TagResponse], dependencies=[Depends(user_access)])
+async def read_tags(
+    skip: int = 0,
+    limit: int = 50,
+    if_none_match: str | None = Header(None),
+    user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
     """
-    **Get a list of tags. / Получение списка всех тэгов** \n
+    **Get a list of tags. / Получение списка тэгов пользователя** \n
+    The response carries a weak ETag of the vault version; a matching If-None-Match gets 304.
 
     :param skip: The number of tags to skip (for pagination). Default is 0.
     :type skip: int
@@ -24,12 +42,49 @@ async def read_tags(skip: int = 0, limit: int = 50, db: Session = Depends(get_db
     :return: A list of TagResponse objects representing the tags.
     :rtype: List[TagResponse]
     """
-    tags = await repository_tags.get_tags(skip, limit, db)
-    return tags
-
+    version = await repository_vault_version.get_version(db, user.id)
+    headers = validator_headers(
+        make_etag("tags", user.id, version, skip, limit, weak=True)
+    )
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
+    tags = await repository_tags.get_tags(user.id, skip, limit, db)
+    return tags_serializer.response(tags, headers=headers)
+
+
+@router.get(
+    "/mine", response_model=List[TagUsageResponse], dependencies=[Depends(user_access)]
+)
+async def read_tag_usage(
+    if_none_match: str | None = Header(None),
+    user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    **Get the tag cloud. / Тэги пользователя с числом записей** \n
+    Every tag of the user with the number of records carrying it, ordered by name.
+    The counts are kept up to date on record writes, no records are read.
+    The response carries a weak ETag of the vault version; a matching If-None-Match gets 304.
 
-@router.get("/{tag_id}", response_model=TagResponse)
-async def read_tag(tag_id: int, db: Session = Depends(get_db)):
+    :param db: The database session. Dependency on get_db.
+    :type db: Session, optional
+    :return: A list of TagUsageResponse objects.
+    :rtype: List[TagUsageResponse]
+    """
+    version = await repository_vault_version.get_version(db, user.id)
+    headers = validator_headers(make_etag("tag_usage", user.id, version, weak=True))
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
+    tags = await repository_tags.get_tag_usage(user.id, db)
+    return tag_usage_serializer.response(tags, headers=headers)
+
+
+@router.get("/{tag_id}", response_model=TagResponse, dependencies=[Depends(user_access)])
+async def read_tag(
+    tag_id: int,
+    user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
     """
     **Get a specific tag by ID. / Получение тэга по id** \n
 
@@ -41,7 +96,7 @@ async def read_tag(tag_id: int, db: Session = Depends(get_db)):
     :rtype: TagResponse
     :raises HTTPException 404: If the tag with the specified ID does not exist.
     """
-    tag = await repository_tags.get_tag(tag_id, db)
+    tag = await repository_tags.get_tag(user.id, tag_id, db)
     if tag is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found"
@@ -49,8 +104,12 @@ async def read_tag(tag_id: int, db: Session = Depends(get_db)):
     return tag
 
 
-@router.post("/", response_model=TagResponse)
-async def create_tag(body: TagModel, db: Session = Depends(get_db)):
+@router.post("/", response_model=TagResponse, dependencies=[Depends(user_access)])
+async def create_tag(
+    body: TagModel,
+    user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
     """
     **Create a new tag. / Создание нового тэга** \n
 
@@ -60,12 +119,22 @@ async def create_tag(body: TagModel, db: Session = Depends(get_db)):
     :type db: Session, optional
     :return: The created TagResponse object representing the new tag.
     :rtype: TagResponse
+    :raises HTTPException 409: If the user already has a tag with this name.
     """
-    return await repository_tags.create_tag(body, db)
+    if await repository_tags.get_tag_by_name(user.id, body.name, db):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Tag already exists"
+        )
+    return await repository_tags.create_tag(user.id, body, db)
 
 
-@router.put("/{tag_id}", response_model=TagResponse)
-async def update_tag(tag_id: int, body: TagModel, db: Session = Depends(get_db)):
+@router.put("/{tag_id}", response_model=TagResponse, dependencies=[Depends(user_access)])
+async def update_tag(
+    tag_id: int,
+    body: TagModel,
+    user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
     """
     **Update an existing tag. / Обновление существующего тэга** \n
 
@@ -78,8 +147,14 @@ async def update_tag(tag_id: int, body: TagModel, db: Session = Depends(get_db))
     :return: The updated TagResponse object representing the updated tag.
     :rtype: TagResponse
     :raises HTTPException 404: If the tag with the specified ID does not exist.
+    :raises HTTPException 409: If the user already has another tag with this name.
     """
-    tag = await repository_tags.update_tag(tag_id, body, db)
+    existing = await repository_tags.get_tag_by_name(user.id, body.name, db)
+    if existing and existing.id != tag_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Tag already exists"
+        )
+    tag = await repository_tags.update_tag(user.id, tag_id, body, db)
     if tag is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found"
@@ -87,8 +162,12 @@ async def update_tag(tag_id: int, body: TagModel, db: Session = Depends(get_db))
     return tag
 
 
-@router.delete("/{tag_id}", response_model=TagResponse)
-async def remove_tag(tag_id: int, db: Session = Depends(get_db)):
+@router.delete("/{tag_id}", response_model=TagResponse, dependencies=[Depends(user_access)])
+async def remove_tag(
+    tag_id: int,
+    user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
     """
     **Remove a tag. / Удаление тэга** \n
 
@@ -100,7 +179,7 @@ async def remove_tag(tag_id: int, db: Session = Depends(get_db)):
     :rtype: TagResponse
     :raises HTTPException 404: If the tag with the specified ID does not exist.
     """
-    tag = await repository_tags.remove_tag(tag_id, db)
+    tag = await repository_tags.remove_tag(user.id, tag_id, db)
     if tag is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found"
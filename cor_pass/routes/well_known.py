@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from starlette.responses import Response
+
+from cor_pass.config.config import settings
+from cor_pass.services.jwks import key_store
+
+
+router = APIRouter(prefix="/.well-known", tags=["Well-known"])
+
+
+@router.get("/jwks.json")
+async def read_jwks():
+    """
+    **Публичные ключи для проверки JWT (JWKS)** \n
+    Gateways cache this document and verify access tokens locally by their kid.
+    With a symmetric settings.algorithm the key set is empty.
+    """
+    return Response(
+        content=key_store.jwks_json,
+        media_type="application/json",
+        headers={"Cache-Control": f"public, max-age={settings.jwks_max_age}"},
+    )
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, EmailStr, conint, field_validator
-from typing import List, Optional
+from pydantic import BaseModel, Field, EmailStr, conint, field_validator, model_validator
+from typing import List, Literal, Optional
 from datetime import datetime
 from cor_pass.database.models import Status
 
@@ -90,6 +90,10 @@ class TagResponse(TagModel):
         from_attributes = True
 
 
+class TagUsageResponse(TagResponse):
+    usage_count: int  # число записей пользователя с этим тэгом
+
+
 class CreateRecordModel(BaseModel):
     record_name: str = Field(max_length=25)
     website: Optional[str] = None
@@ -116,6 +120,61 @@ class RecordResponse(BaseModel):
         from_attributes = True
 
 
+class RecordChangesResponse(BaseModel):
+    records: List[RecordResponse]
+    deleted: List[int]  # record_id удаленных записей
+    cursor: str
+    has_more: bool
+
+
+class RecordSearchResponse(BaseModel):
+    records: List[RecordResponse]
+    next_after: Optional[int] = None  # передать в after для следующей страницы
+
+
+class RecordOperation(BaseModel):
+    op: Literal["create", "update", "delete", "retag"]
+    record_id: Optional[int] = None  # для update, delete, retag
+    record: Optional[CreateRecordModel] = None  # для create, update
+    tag_names: Optional[List[str]] = None  # для retag
+
+    @model_validator(mode="after")
+    def fields_match_op(self):
+        if (self.op == "create") != (self.record_id is None):
+            raise ValueError("record_id is required for update, delete and retag only")
+        if (self.op in ("create", "update")) != (self.record is not None):
+            raise ValueError("record is required for create and update only")
+        if (self.op == "retag") != (self.tag_names is not None):
+            raise ValueError("tag_names is required for retag only")
+        return self
+
+
+class RecordBatchModel(BaseModel):
+    operations: List[RecordOperation] = Field(min_length=1, max_length=500)
+
+
+class RecordOperationResult(BaseModel):
+    op: str
+    record_id: Optional[int] = None
+    status: int  # HTTP-статус операции: 200, 201, 402, 404
+    detail: Optional[str] = None
+
+
+class RecordBatchResponse(BaseModel):
+    results: List[RecordOperationResult]  # в порядке operations
+
+
+class ImportErrorModel(BaseModel):
+    line: Optional[int] = None  # строка файла или номер элемента JSON
+    error: str
+
+
+class RecordImportResponse(BaseModel):
+    imported: int
+    skipped: int
+    errors: List[ImportErrorModel]  # первые 20 ошибок
+
+
 # PASS-GENERATOR MODELS
 
 
@@ -125,13 +184,38 @@ class PasswordGeneratorSettings(BaseModel):
     include_lowercase: bool = True
     include_digits: bool = True
     include_special: bool = True
+    count: int = Field(1, ge=1, le=1000)
 
 
 class WordPasswordGeneratorSettings(BaseModel):
-    length: int = Field(4, ge=1, le=7)
+    length: int = Field(4, ge=1, le=12)
     separator_hyphen: bool = True
     separator_underscore: bool = True
     include_uppercase: bool = True
+    count: int = Field(1, ge=1, le=1000)
+    wordlist: str = Field("en-basic", pattern=r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class WordlistModel(BaseModel):
+    name: str
+    words: int
+    bits_per_word: float
+
+
+class BreachCheckModel(BaseModel):
+    password: Optional[str] = Field(None, max_length=1024)
+    # SHA-1 пароля в hex: клиент может не передавать сам пароль
+    sha1: Optional[str] = Field(None, pattern=r"^[0-9a-fA-F]{40}$")
+
+    @model_validator(mode="after")
+    def password_or_sha1_required(self):
+        if (self.password is None) == (self.sha1 is None):
+            raise ValueError("Exactly one of password or sha1 is required")
+        return self
+
+
+class BreachCheckResponse(BaseModel):
+    breached: bool
 
 
 # MEDICAL MODELS
@@ -154,6 +238,10 @@ class ResponseCorIdModel(BaseModel):
     cor_id: str = None
 
 
+class CorIdBatchModel(BaseModel):
+    cor_ids: List[str] = Field(max_length=10000)
+
+
 # OTP MODELS
 
 
@@ -174,3 +262,12 @@ class OTPRecordResponse(BaseModel):
 class UpdateOTPRecordModel(BaseModel):
     record_name: str = Field(max_length=25)
     username: str = Field(max_length=25)
+
+
+class VerifyOTPModel(BaseModel):
+    code: str = Field(pattern=r"^\d{6}$")
+
+
+class VerifyOTPResponse(BaseModel):
+    valid: bool
+    detail: str
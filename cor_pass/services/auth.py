@@ -10,7 +10,8 @@ from sqlalchemy.orm import Session
 from cor_pass.database.db import get_db
 from cor_pass.repository import person as repository_users
 from cor_pass.config.config import settings
-from cor_pass.services.logger import logger
+from cor_pass.services.logger import logger, bind_user
+from cor_pass.services.jwks import key_store
 
 
 class Auth:
@@ -19,6 +20,40 @@ class Auth:
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+    def encode_token(self, to_encode: dict) -> str:
+        """
+        The encode_token function signs the claims with the shared secret (HS*) or,
+        when settings.algorithm is asymmetric, with the active key of the key store.
+        The kid header lets gateways pick the matching key from /.well-known/jwks.json.
+
+        :param self: Represent the instance of the class
+        :param to_encode: dict: The claims to sign
+        :return: An encoded token
+        """
+        if key_store.enabled:
+            kid, signing_key = key_store.signing_key
+            return jwt.encode(
+                to_encode, signing_key, algorithm=self.ALGORITHM, headers={"kid": kid}
+            )
+        return jwt.encode(to_encode, key=self.SECRET_KEY, algorithm=self.ALGORITHM)
+
+    def decode_token(self, token: str) -> dict:
+        """
+        The decode_token function verifies the token signature and returns its claims.
+
+        :param self: Represent the instance of the class
+        :param token: str: The encoded token
+        :return: The token payload
+        :raises JWTError: If the token is malformed, expired or signed by an unknown key
+        """
+        if key_store.enabled:
+            kid = jwt.get_unverified_header(token).get("kid")
+            verification_key = key_store.verification_key(kid)
+            if verification_key is None:
+                raise JWTError(f"Unknown signing key: {kid}")
+            return jwt.decode(token, verification_key, algorithms=self.ALGORITHM)
+        return jwt.decode(token, key=self.SECRET_KEY, algorithms=self.ALGORITHM)
+
     def verify_password(self, plain_password, hashed_password):
         """
         The verify_password function takes a plain-text password and the hashed version of that password,
@@ -61,10 +96,8 @@ class Auth:
             {"iat": datetime.now(timezone.utc), "exp": expire, "scp": "access_token"}
         )
 
-        encoded_access_token = jwt.encode(
-            to_encode, key=self.SECRET_KEY, algorithm=self.ALGORITHM
-        )
-        logger.debug(f"Access token: {encoded_access_token}")
+        encoded_access_token = self.encode_token(to_encode)
+        logger.debug("Access token issued for {}", to_encode.get("oid"))
         return encoded_access_token
 
     async def create_refresh_token(
@@ -90,10 +123,8 @@ class Auth:
             {"iat": datetime.now(timezone.utc), "exp": expire, "scp": "refresh_token"}
         )
 
-        encoded_refresh_token = jwt.encode(
-            to_encode, key=self.SECRET_KEY, algorithm=self.ALGORITHM
-        )
-        logger.debug(f"refresh token: {encoded_refresh_token}")
+        encoded_refresh_token = self.encode_token(to_encode)
+        logger.debug("Refresh token issued for {}", to_encode.get("oid"))
         return encoded_refresh_token
 
     async def decode_refresh_token(self, refresh_token: str):
@@ -109,9 +140,7 @@ class Auth:
         """
         try:
 
-            payload = jwt.decode(
-                refresh_token, key=self.SECRET_KEY, algorithms=self.ALGORITHM
-            )
+            payload = self.decode_token(refresh_token)
 
             if payload["scp"] == "refresh_token":
                 id = payload["oid"]
@@ -138,6 +167,20 @@ class Auth:
         :param db: Session: Get the database session
         :return: An object of type user
         """
+        return await self.get_user_from_token(token, db)
+
+    async def get_user_from_token(self, token: str, db: Session):
+        """
+        The get_user_from_token function validates an access token and loads its user.
+        It backs get_current_user and is called directly where no Authorization header
+        is available, e.g. for WebSocket connections.
+
+        :param self: Represent the instance of the class
+        :param token: str: The access token
+        :param db: Session: Get the database session
+        :return: An object of type user
+        :raises HTTPException 401: If the token or its user is not valid
+        """
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -145,7 +188,7 @@ class Auth:
         )
         try:
 
-            payload = jwt.decode(token, key=self.SECRET_KEY, algorithms=self.ALGORITHM)
+            payload = self.decode_token(token)
 
             if payload["scp"] == "access_token":
                 cor_id = payload["oid"]
@@ -159,6 +202,7 @@ class Auth:
         user = await repository_users.get_user_by_corid(cor_id, db)
         if user is None:
             raise credentials_exception
+        bind_user(user.id)
         return user
 
     # Функция для проверки допустимости редирект URL
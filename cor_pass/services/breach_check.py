@@ -0,0 +1,137 @@
+"""
+Офлайн-проверка паролей по базе утечек (Pwned Passwords) через отсортированный индекс в mmap
+
+Формат индекса:
+    magic (8 байт) | count (<Q) | fanout: 65537 смещений (<Q) | count хэшей по 8 байт
+Хэш - первые 8 байт SHA-1 пароля; хэши отсортированы и уникальны.
+fanout[p] - номер первого хэша, начинающегося с 2-байтного префикса p, так что
+бинарный поиск идет только внутри одного блока (в среднем count / 65536 записей).
+"""
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+
+from cor_pass.config.config import settings
+
+MAGIC = b"CORBR\x00\x01\x00"
+HASH_SIZE = 8
+_FANOUT_SIZE = 1 << 16
+_HEADER = struct.Struct("<8sQ")
+_FANOUT = struct.Struct(f"<{_FANOUT_SIZE + 1}Q")
+_ENTRIES_START = _HEADER.size + _FANOUT.size
+
+
+class BreachIndex:
+    """
+    Read-only view of the breach index.
+
+    The file is mapped on first use and shared through the page cache by all workers;
+    a lookup touches the fanout entry and about log2(count / 65536) hashes, so a
+    corpus of hundreds of millions of hashes answers in microseconds once warm.
+    Truncating SHA-1 to 64 bits gives a false positive rate of about count / 2**64.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._map = None
+        self._fanout = None
+        self.count = 0
+
+    @property
+    def available(self) -> bool:
+        return self._map is not None or self.path.is_file()
+
+    def _open(self) -> mmap.mmap:
+        if self._map is None:
+            with open(self.path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, count = _HEADER.unpack_from(mapped)
+            if magic != MAGIC:
+                mapped.close()
+                raise ValueError(f"{self.path} is not a breach index")
+            self.count = count
+            self._fanout = _FANOUT.unpack_from(mapped, _HEADER.size)
+            self._map = mapped
+        return self._map
+
+    def contains_sha1(self, digest: bytes) -> bool:
+        """
+        The contains_sha1 function looks up a SHA-1 digest (the first 8 bytes are used).
+        """
+        mapped = self._open()
+        needle = digest[:HASH_SIZE]
+        prefix = int.from_bytes(needle[:2], "big")
+        low, high = self._fanout[prefix], self._fanout[prefix + 1]
+        while low < high:
+            middle = (low + high) // 2
+            offset = _ENTRIES_START + middle * HASH_SIZE
+            value = mapped[offset : offset + HASH_SIZE]
+            if value < needle:
+                low = middle + 1
+            elif value > needle:
+                high = middle
+            else:
+                return True
+        return False
+
+    def contains_password(self, password: str) -> bool:
+        return self.contains_sha1(hashlib.sha1(password.encode("utf-8")).digest())
+
+
+breach_index = BreachIndex(settings.breach_index_path)
+
+
+def build_breach_index(source_path: str, index_path: str) -> int:
+    """
+    The build_breach_index function converts the Pwned Passwords SHA-1 dump
+    ("ordered by hash" file, lines "HASH:count") into the index format in one pass.
+
+    :param source_path: str: The text dump, sorted by hash
+    :param index_path: str: Where to write the index
+    :return: The number of hashes written
+    :raises ValueError: If the dump is not sorted
+    """
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = index_path.with_suffix(".tmp")
+    prefix_counts = [0] * _FANOUT_SIZE
+    count = 0
+    previous = b""
+    with open(source_path, "rb") as source, open(temporary_path, "wb") as index:
+        index.write(b"\x00" * _ENTRIES_START)
+        buffer = bytearray()
+        for line in source:
+            if not line.strip():
+                continue
+            value = bytes.fromhex(line[: HASH_SIZE * 2].decode("ascii"))
+            if value == previous:
+                continue
+            if value < previous:
+                raise ValueError(f"{source_path} is not sorted by hash")
+            previous = value
+            buffer += value
+            prefix_counts[int.from_bytes(value[:2], "big")] += 1
+            count += 1
+            if len(buffer) >= 1 << 20:
+                index.write(buffer)
+                buffer.clear()
+        index.write(buffer)
+        fanout = [0]
+        for prefix_count in prefix_counts:
+            fanout.append(fanout[-1] + prefix_count)
+        index.seek(0)
+        index.write(_HEADER.pack(MAGIC, count))
+        index.write(_FANOUT.pack(*fanout))
+    os.replace(temporary_path, index_path)
+    return count
+
+
+if __name__ == "__main__":
+    # Построение индекса: python -m cor_pass.services.breach_check build pwnedpasswords.txt
+    if len(sys.argv) != 3 or sys.argv[1] != "build":
+        sys.exit("usage: python -m cor_pass.services.breach_check build <hashes.txt>")
+    written = build_breach_index(sys.argv[2], settings.breach_index_path)
+    print(f"{settings.breach_index_path}: {written} hashes")
@@ -11,6 +11,7 @@ from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
 import os
 import base64
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from Crypto.Util.Padding import pad as crypto_pad
 
 from cor_pass.config.config import settings
@@ -44,6 +45,37 @@ async def decrypt_data(encrypted_data: bytes, key: bytes) -> str:
     return decrypted_data.decode()
 
 
+def encrypt_data_many(values: list, key: bytes) -> list:
+    """
+    Synchronous batch form of encrypt_data for bulk paths: one unwrapped key for the
+    whole batch, None is encrypted as an empty string. Returns base64 strings.
+    """
+    result = []
+    for value in values:
+        cipher = AES.new(key, AES.MODE_CBC)
+        encrypted_data = cipher.encrypt(pad(value or "", AES.block_size))
+        result.append(base64.b64encode(cipher.iv + encrypted_data).decode())
+    return result
+
+
+def decrypt_data_many(values: list, key: bytes) -> list:
+    """
+    Synchronous batch form of decrypt_data for streaming paths: one unwrapped key for
+    the whole batch, empty values are returned as None.
+    """
+    result = []
+    for value in values:
+        if not value:
+            result.append(None)
+            continue
+        decoded_data = base64.b64decode(value)
+        cipher = AES.new(key, AES.MODE_CBC, decoded_data[: AES.block_size])
+        result.append(
+            unpad(cipher.decrypt(decoded_data[AES.block_size :]), AES.block_size).decode()
+        )
+    return result
+
+
 async def generate_aes_key() -> bytes:
     random_key = secrets.token_urlsafe(16)
     sha256 = hashlib.sha256()
@@ -92,3 +124,46 @@ async def decrypt_user_key(encrypted_key: str) -> bytes:
 
     cipher = Fernet(base64.urlsafe_b64encode(aes_key))
     return cipher.decrypt(ciphertext)
+
+
+"""
+AEAD (AES-GCM) для коротких секретов, например OTP ключей
+Формат: "v1:" + base64(nonce | ciphertext | tag), aad привязывает значение к владельцу
+"""
+
+AEAD_PREFIX = "v1:"
+
+
+def is_aead_encrypted(value: str | None) -> bool:
+    return bool(value) and value.startswith(AEAD_PREFIX)
+
+
+def aead_encrypt(data: str, key: bytes, aad: bytes) -> str:
+    nonce = os.urandom(12)
+    ciphertext = AESGCM(key).encrypt(nonce, data.encode(), aad)
+    return AEAD_PREFIX + base64.b64encode(nonce + ciphertext).decode()
+
+
+def aead_decrypt_many(values: list, key: bytes, aad: bytes) -> list:
+    """
+    Decrypts a batch of values under one key with a single AESGCM context.
+    Values without the AEAD prefix are legacy plaintext and are returned unchanged.
+    """
+    aesgcm = AESGCM(key)
+    result = []
+    for value in values:
+        if not is_aead_encrypted(value):
+            result.append(value)
+            continue
+        raw = base64.b64decode(value[len(AEAD_PREFIX) :])
+        result.append(aesgcm.decrypt(raw[:12], raw[12:], aad).decode())
+    return result
+
+
+async def encrypt_secret(data: str, key: bytes, aad: bytes) -> str:
+    return aead_encrypt(data, key, aad)
+
+
+async def decrypt_secrets(values: list, key: bytes, aad: bytes) -> list:
+    # Пачка расшифровывается в одном вызове в пуле потоков, event loop свободен
+    return await asyncio.to_thread(aead_decrypt_many, values, key, aad)
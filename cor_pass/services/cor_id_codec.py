@@ -0,0 +1,103 @@
+"""
+Кодирование и декодирование Cor-ID
+
+Cor-ID: <base36(дни с 01.01.2024 | код учреждения | номер пациента)>-<год рождения><пол>,
+дни, учреждение и пациент - по 5 десятичных разрядов.
+"""
+import re
+from typing import Iterable, List, Tuple
+
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_FIELD = 10**5
+
+# Обратная таблица: код символа -> значение цифры (только заглавные, как и раньше)
+_DIGIT_VALUES = {char: value for value, char in enumerate(ALPHABET)}
+# Прямая таблица для пар цифр: один divmod дает два символа
+_PAIRS = tuple(high + low for high in ALPHABET for low in ALPHABET)
+_BASE36 = re.compile(r"[0-9A-Z]+")
+_SUFFIX = re.compile(r"(\d+)([MF])")
+
+
+class InvalidCorId(ValueError):
+    pass
+
+
+def to_base36(num: int) -> str:
+    if num <= 0:
+        return ""
+    result = []
+    while num >= 36:
+        num, remainder = divmod(num, 1296)
+        result.append(_PAIRS[remainder])
+    if num:
+        result.append(ALPHABET[num])
+    encoded = "".join(reversed(result))
+    return encoded.lstrip("0")
+
+
+def from_base36(digits: str) -> int:
+    if not _BASE36.fullmatch(digits):
+        invalid = next((char for char in digits if char not in _DIGIT_VALUES), None)
+        if invalid is None:
+            raise InvalidCorId("Cor-ID number part is empty.")
+        raise InvalidCorId(f"Invalid character '{invalid}' in Cor-ID.")
+    # Проверенная строка переводится встроенным int за один вызов
+    return int(digits, 36)
+
+
+def encode(n_days: int, n_facility: int, n_patient: int, birth_year: int, sex: str) -> str:
+    """
+    The encode function builds a Cor-ID from its parts.
+    """
+    for name, value in (("n_days", n_days), ("n_facility", n_facility), ("n_patient", n_patient)):
+        if not 0 <= value < _FIELD:
+            raise InvalidCorId(f"{name} must be between 0 and 99999 inclusive.")
+    number = (n_days * _FIELD + n_facility) * _FIELD + n_patient
+    return f"{to_base36(number)}-{birth_year}{sex}"
+
+
+def decode(cor_id: str) -> dict:
+    """
+    The decode function splits a Cor-ID into its parts.
+
+    :param cor_id: str: The Cor-ID
+    :return: A dict with n_days_since_first_jan_2024, n_facility, n_patient, birth_year and sex
+    :raises InvalidCorId: If the Cor-ID is malformed
+    """
+    base36_str, separator, suffix = cor_id.partition("-")
+    if not separator or "-" in suffix:
+        raise InvalidCorId("Cor-ID format is invalid. Expected a '-'.")
+    number = from_base36(base36_str)
+    suffix_match = _SUFFIX.fullmatch(suffix)
+    if suffix_match is None:
+        raise InvalidCorId("Invalid birth year or sex in Cor-ID suffix.")
+    rest, n_patient = divmod(number, _FIELD)
+    n_days, n_facility = divmod(rest, _FIELD)
+    return {
+        "n_days_since_first_jan_2024": n_days,
+        "n_facility": n_facility,
+        "n_patient": n_patient,
+        "birth_year": int(suffix_match.group(1)),
+        "sex": suffix_match.group(2),
+    }
+
+
+def encode_many(parts: Iterable[Tuple[int, int, int, int, str]]) -> List[str]:
+    """
+    The encode_many function encodes (n_days, n_facility, n_patient, birth_year, sex) tuples.
+    """
+    return [encode(*item) for item in parts]
+
+
+def decode_many(cor_ids: Iterable[str]) -> List[dict]:
+    """
+    The decode_many function decodes every Cor-ID independently: a malformed one
+    yields {"cor_id": ..., "error": ...} instead of failing the whole batch.
+    """
+    results = []
+    for cor_id in cor_ids:
+        try:
+            results.append({"cor_id": cor_id, **decode(cor_id)})
+        except InvalidCorId as e:
+            results.append({"cor_id": cor_id, "error": str(e)})
+    return results
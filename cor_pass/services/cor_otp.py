@@ -1,13 +1,275 @@
-import pyotp
-import requests
+"""
+Пакетная генерация TOTP-кодов (RFC 6238, SHA1, 6 цифр, окно 30 секунд)
+"""
+import asyncio
+import hashlib
+import hmac
+import re
+import struct
 import time
+from collections import OrderedDict
+from typing import Hashable, Iterable, List, Tuple
 
+from cor_pass.config.config import settings
+from cor_pass.services.logger import logger
 
-def generate_and_verify_otp(secret: str):
+INTERVAL = 30
+DIGITS = 6
+_MODULO = 10**DIGITS
+_WINDOW_CACHE_SIZE = 100_000
+
+_BASE32 = re.compile(r"[A-Za-z2-7]*")
+# Алфавит base32 (RFC 4648) -> цифры системы счисления 32 для int(..., 32)
+_BASE32_DIGITS = str.maketrans(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ234567abcdefghijklmnopqrstuvwxyz",
+    "0123456789abcdefghijklmnopqrstuv0123456789abcdefghijklmnop",
+)
+
+
+def decode_secret(secret: str) -> bytes:
+    """
+    The decode_secret function base32-decodes an OTP secret the same way pyotp does
+    (case-insensitive, padding optional), as one int conversion instead of
+    base64.b32decode. Decoded secrets are not cached.
+
+    :raises ValueError: If the secret is not valid base32
+    """
+    digits = secret.replace(" ", "").rstrip("=")
+    # Длины, которые не дают целого числа байт, b32decode тоже отвергает
+    if len(digits) % 8 in (1, 3, 6):
+        raise ValueError("Incorrect padding")
+    if not _BASE32.fullmatch(digits):
+        raise ValueError("Non-base32 digit found")
+    length = len(digits) * 5 // 8
+    value = int(digits.translate(_BASE32_DIGITS), 32) if digits else 0
+    return (value >> (len(digits) * 5 - length * 8)).to_bytes(length, "big")
+
+
+def _hotp(key: bytes, counter: int) -> str:
+    digest = hmac.digest(key, struct.pack(">Q", counter), hashlib.sha1)
+    offset = digest[-1] & 0x0F
+    code = (struct.unpack_from(">I", digest, offset)[0] & 0x7FFFFFFF) % _MODULO
+    return f"{code:0{DIGITS}d}"
+
+
+class TOTPEngine:
+    """
+    Generates the codes for a whole page of OTP records in one pass.
+
+    The clock is read once per call, so every code of a page belongs to the same window.
+    Codes can be memoized by a caller-supplied key (record id and vault version, never
+    the secret itself) until the window boundary: every request inside the same
+    30 seconds reuses them.
+    """
+
+    def __init__(self, cache_size: int = _WINDOW_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._window = None
+        self._codes = {}
+
+    def _codes_for_window(self, window: int) -> dict:
+        if window != self._window:
+            self._window = window
+            self._codes = {}
+        elif len(self._codes) >= self.cache_size:
+            self._codes.clear()
+        return self._codes
+
+    def generate_many(
+        self,
+        secrets: Iterable[str],
+        now: float | None = None,
+        keys: Iterable[Hashable] | None = None,
+    ) -> Tuple[List[str], float]:
+        """
+        The generate_many function returns the current code for each secret and
+        the number of seconds left in the window.
+
+        :param secrets: Iterable[str]: Base32 OTP secrets
+        :param now: float | None: Unix time, read from the clock when omitted
+        :param keys: Iterable[Hashable] | None: Memo keys of the secrets, which must change
+            whenever a secret changes, e.g. (record_id, vault version); without keys
+            nothing is memoized
+        :return: The codes in the order of secrets and the remaining time
+        """
+        if now is None:
+            now = time.time()
+        window = int(now // INTERVAL)
+        if keys is None:
+            codes = [_hotp(decode_secret(secret), window) for secret in secrets]
+            return codes, INTERVAL - (now % INTERVAL)
+        memo = self._codes_for_window(window)
+        codes = []
+        for key, secret in zip(keys, secrets):
+            code = memo.get(key)
+            if code is None:
+                code = memo[key] = _hotp(decode_secret(secret), window)
+            codes.append(code)
+        return codes, INTERVAL - (now % INTERVAL)
+
+    def verify(
+        self, secret: str, code: str, drift: int = 1, now: float | None = None
+    ) -> int | None:
+        """
+        The verify function checks a code against the current window and ``drift``
+        windows on each side.
+
+        :param secret: str: Base32 OTP secret
+        :param code: str: The code to check
+        :param drift: int: Allowed clock drift in windows
+        :param now: float | None: Unix time, read from the clock when omitted
+        :return: The counter of the matching window, or None
+        """
+        if now is None:
+            now = time.time()
+        window = int(now // INTERVAL)
+        key = decode_secret(secret)
+        matched = None
+        # Проверяются все окна, время ответа не зависит от того, какое совпало
+        for counter in range(window - drift, window + drift + 1):
+            if hmac.compare_digest(_hotp(key, counter), code):
+                matched = counter
+        return matched
+
+
+totp_engine = TOTPEngine()
+
+
+class ReplayCacheFull(Exception):
+    """
+    The used-code cache has no room for an unexpired entry: the code cannot be
+    protected against replay and must not be accepted.
+    """
+
+
+class UsedCodeCache:
+    """
+    Bounded in-memory set of used (record, counter) pairs with expiry, for a single worker.
+    Several workers need RedisUsedCodeCache: a code replayed to another worker would
+    not be found here.
+
+    Entry lifetimes differ by at most a few windows, so insertion order is close to expiry
+    order: expired entries are dropped from the front in O(1) each, and a lookup also checks
+    the expiry of its own entry. Unexpired entries are never evicted: when the cache is
+    full, add raises ReplayCacheFull.
+    """
 
-    totp = pyotp.TOTP(secret)
-    otp = totp.now()
-    time_remaining = totp.interval - (time.time() % totp.interval)
-    print(f"Generated OTP: {otp}")
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._overflow_reported = False
 
-    return otp, time_remaining
+    async def add(self, key: str, ttl: float) -> bool:
+        """
+        Marks key as used. Returns False when it was already used and has not expired.
+
+        :raises ReplayCacheFull: If the cache is full of unexpired entries
+        """
+        now = time.monotonic()
+        entries = self._entries
+        while entries:
+            oldest_key, expires_at = next(iter(entries.items()))
+            if expires_at > now:
+                break
+            del entries[oldest_key]
+        expires_at = entries.get(key)
+        if expires_at is not None and expires_at > now:
+            return False
+        if len(entries) >= self.max_size:
+            if not self._overflow_reported:
+                self._overflow_reported = True
+                logger.warning("OTP replay cache is full, codes are rejected")
+            raise ReplayCacheFull()
+        self._overflow_reported = False
+        entries[key] = now + ttl
+        return True
+
+
+class RedisUsedCodeCache:
+    """
+    Shares used codes between workers through any Redis-protocol server (SET NX EX).
+    """
+
+    def __init__(self, url: str):
+        from redis import asyncio as redis
+
+        self._redis = redis.from_url(url)
+
+    async def add(self, key: str, ttl: float) -> bool:
+        return bool(
+            await self._redis.set(f"otp_used:{key}", 1, nx=True, ex=max(1, int(ttl)))
+        )
+
+
+used_codes = (
+    RedisUsedCodeCache(settings.otp_replay_redis_url)
+    if settings.otp_replay_redis_url
+    else UsedCodeCache(settings.otp_replay_cache_size)
+)
+
+
+async def verify_otp(
+    record_id: int, secret: str, code: str, drift: int | None = None
+) -> tuple[bool, str]:
+    """
+    The verify_otp function checks a code for an otp record and rejects replays:
+    a code accepted once cannot be accepted again while its window is still in range.
+
+    :return: Whether the code is accepted and the reason
+    """
+    if drift is None:
+        drift = settings.otp_verify_drift
+    counter = totp_engine.verify(secret, code, drift)
+    if counter is None:
+        return False, "Invalid code"
+    # Код действителен, пока его окно в пределах ±drift от текущего
+    ttl = (counter + drift + 1) * INTERVAL - time.time()
+    try:
+        fresh = await used_codes.add(f"{record_id}:{counter}", ttl)
+    except ReplayCacheFull:
+        return False, "Too many codes verified, try again later"
+    if not fresh:
+        return False, "Code already used"
+    return True, "Code is valid"
+
+
+class WindowTicker:
+    """
+    One timer per worker that wakes all OTP stream subscribers at the TOTP window boundary.
+    The timer task runs only while somebody is waiting on it.
+    """
+
+    # Просыпаться чуть позже границы окна, чтобы time.time() уже был в новом окне
+    BOUNDARY_DELAY = 0.01
+
+    def __init__(self):
+        self._event = None
+        self._task = None
+        self._waiters = 0
+
+    async def wait_next_window(self) -> None:
+        if self._task is None or self._task.done():
+            self._event = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        event = self._event
+        self._waiters += 1
+        try:
+            await event.wait()
+        finally:
+            self._waiters -= 1
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(INTERVAL - time.time() % INTERVAL + self.BOUNDARY_DELAY)
+            event, self._event = self._event, asyncio.Event()
+            event.set()
+            if not self._waiters:
+                return
+
+
+window_ticker = WindowTicker()
+
+
+def generate_and_verify_otp(secret: str):
+    codes, time_remaining = totp_engine.generate_many((secret,))
+    return codes[0], time_remaining
@@ -1,13 +1,16 @@
+import asyncio
+import re
+from email.message import EmailMessage
+from email.utils import formataddr
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
-from pydantic import EmailStr
-
-from io import BytesIO
-from fastapi import UploadFile
+import aiosmtplib
+from fastapi_mail import ConnectionConfig
+from jinja2 import Environment, FileSystemLoader, meta, select_autoescape
+from markupsafe import Markup, escape
 
 from cor_pass.config.config import settings
+from cor_pass.repository import email_outbox
 from cor_pass.services.logger import logger
 from cor_pass.services.qr_code import generate_qr_code
 from cor_pass.services.recovery_file import generate_recovery_file
@@ -27,96 +30,275 @@ conf = ConnectionConfig(
     TEMPLATE_FOLDER=Path(__file__).parent.parent / "templates",
 )
 
+# Виды писем: kind -> (тема, шаблон)
+TEMPLATES = {
+    "verification": ("Confirm your email ", "email_templates.html"),  # registration
+    "forgot_password": ("Forgot Password", "forgot_password_email_template.html"),
+    "recovery_code": ("Recovery code", "recovery_code.html"),
+}
+
+_SLOT = re.compile(r"\x00(\w+)\x00")
+
 
-async def send_email_code(
-    email: EmailStr, host: str, verification_code
-):  # registration
+class PrecompiledTemplate:
     """
-    The send_email function sends an email to the user with a link to confirm their email address.\n
-        Args:
-            email (str): The user's email address.
-            host (str): The hostname that will be used in constructing a URL for confirming their account registration.
-
-    :param email: EmailStr: Validate the email address
-    :param host: str: Pass the hostname of the server to the template
-    :return: A coroutine object
+    A template rendered once with placeholder markers in place of its fields.
+    Rendering a message only escapes the field values and joins them with the
+    pre-rendered static chunks; jinja is not involved per message.
+
+    Templates that use their fields in anything but plain substitutions (conditions,
+    filters) are detected at load time and rendered through jinja as usual.
     """
-    logger.debug(f"Sending email to {email}")
-    try:
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={
-                "host": host,
-                "code": verification_code,
-            },
-            subtype=MessageType.html,
+
+    def __init__(self, environment: Environment, name: str):
+        self.name = name
+        self.template = environment.get_template(name)
+        source = environment.loader.get_source(environment, name)[0]
+        self.fields = sorted(meta.find_undeclared_variables(environment.parse(source)))
+        rendered = self.template.render(
+            **{field: Markup(f"\x00{field}\x00") for field in self.fields}
         )
+        parts = _SLOT.split(rendered)
+        self.chunks = parts[0::2]
+        self.slots = parts[1::2]
+        probe = {field: f"<{field}&probe>" for field in self.fields}
+        self.precompiled = self._join(probe) == self.template.render(**probe)
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_templates.html")
-        logger.debug(f"Sending email to {email} done!")
-    except ConnectionErrors as err:
-        print(err)
+    def _join(self, fields: dict) -> str:
+        values = [str(escape(fields.get(slot))) for slot in self.slots]
+        output = [self.chunks[0]]
+        for value, chunk in zip(values, self.chunks[1:]):
+            output.append(value)
+            output.append(chunk)
+        return "".join(output)
+
+    def render(self, fields: dict) -> str:
+        if self.precompiled:
+            return self._join(fields)
+        return self.template.render(**fields)
+
+
+# Шаблоны компилируются один раз при импорте, кэш байткода на диске не нужен
+templates = Environment(
+    loader=FileSystemLoader(conf.TEMPLATE_FOLDER),
+    autoescape=select_autoescape(["html"]),
+)
+compiled_templates = {
+    template_name: PrecompiledTemplate(templates, template_name)
+    for _, template_name in TEMPLATES.values()
+}
 
 
-async def send_email_code_forgot_password(
-    email: EmailStr, host: str, verification_code
-):  # forgot password
+async def build_message(kind: str, recipient: str, fields: dict) -> EmailMessage:
     """
-    The send_email function sends an email to the user with a link to confirm their email address.\n
-        Args:
-            email (str): The user's email address.
-            host (str): The hostname that will be used in constructing a URL for confirming their account registration.
-
-    :param email: EmailStr: Validate the email address
-    :param host: str: Pass the hostname of the server to the template
-    :return: A coroutine object
+    The build_message function renders an outbox message into a MIME message.
+    Recovery code messages get the QR code and the recovery file attached.
+
+    :param kind: str: A key of TEMPLATES
+    :param recipient: str: The recipient address
+    :param fields: dict: The template fields
+    :return: The message ready to be sent
     """
-    logger.debug(f"Sending email to {email}")
-    try:
-        message = MessageSchema(
-            subject="Forgot Password",
-            recipients=[email],
-            template_body={
-                "host": host,
-                "code": verification_code,
-            },
-            subtype=MessageType.html,
+    subject, template_name = TEMPLATES[kind]
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = formataddr((conf.MAIL_FROM_NAME, conf.MAIL_FROM))
+    message["To"] = recipient
+    message.set_content(
+        compiled_templates[template_name].render(fields), subtype="html"
+    )
+    if kind == "recovery_code":
+        recovery_code = fields["recovery_code"]
+        message.add_attachment(
+            generate_qr_code(recovery_code),
+            maintype="image",
+            subtype="png",
+            filename="qrcode.png",
         )
-
-        fm = FastMail(conf)
-        await fm.send_message(
-            message, template_name="forgot_password_email_template.html"
+        recovery_file = await generate_recovery_file(recovery_code)
+        message.add_attachment(
+            recovery_file.getvalue(),
+            maintype="application",
+            subtype="octet-stream",
+            filename="recovery_key.bin",
         )
-        logger.debug(f"Sending email to {email} done!")
-    except ConnectionErrors as err:
-        print(err)
+    return message
 
 
-async def send_email_code_with_qr(email: EmailStr, host: str, recovery_code):
-    logger.debug(f"Sending email to {email}")
-    try:
-        # Генерация QR кода
-        qr_code_bytes = generate_qr_code(recovery_code)
-        recovery_file = await generate_recovery_file(recovery_code)
+class SMTPPool:
+    """
+    Keeps up to ``size`` logged-in SMTP connections, so TLS handshakes and logins are
+    paid once per connection instead of once per message.
+
+    A semaphore counts the connections in use or idle: discarding a connection or
+    failing to open one frees its slot, and a task waiting in acquire takes it over.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._slots = asyncio.Semaphore(size)
+        self._idle = []
+
+    async def _login(self, smtp: aiosmtplib.SMTP) -> None:
+        await smtp.connect()
+        if conf.USE_CREDENTIALS:
+            await smtp.login(conf.MAIL_USERNAME, conf.MAIL_PASSWORD)
+
+    async def acquire(self) -> aiosmtplib.SMTP:
+        await self._slots.acquire()
+        if self._idle:
+            smtp = self._idle.pop()
+        else:
+            smtp = aiosmtplib.SMTP(
+                hostname=conf.MAIL_SERVER,
+                port=conf.MAIL_PORT,
+                use_tls=conf.MAIL_SSL_TLS,
+                start_tls=conf.MAIL_STARTTLS,
+                validate_certs=conf.VALIDATE_CERTS,
+            )
+        try:
+            if not smtp.is_connected:
+                await self._login(smtp)
+        except BaseException:
+            smtp.close()
+            self._slots.release()
+            raise
+        return smtp
+
+    def release(self, smtp: aiosmtplib.SMTP) -> None:
+        self._idle.append(smtp)
+        self._slots.release()
+
+    def discard(self, smtp: aiosmtplib.SMTP) -> None:
+        smtp.close()
+        self._slots.release()
+
+    async def close(self) -> None:
+        while self._idle:
+            smtp = self._idle.pop()
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+
+
+class EmailDispatcher:
+    """
+    Background task of every worker: claims due outbox messages in batches, sends them
+    through the SMTP pool and records sent / retry / dead outcomes.
+    """
+
+    def __init__(self):
+        self.pool = SMTPPool(settings.mail_pool_size)
+        self._task = None
+        self._wakeup = asyncio.Event()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.pool.close()
+
+    def notify(self) -> None:
+        """
+        Wakes the dispatcher right after a request committed new messages,
+        instead of waiting for the next poll.
+        """
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                batch = await asyncio.to_thread(
+                    email_outbox.claim_due_emails,
+                    settings.mail_batch_size,
+                    settings.mail_lease_seconds,
+                )
+                if batch:
+                    results = await self._send_batch(batch)
+                    await asyncio.to_thread(email_outbox.record_results, results)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.opt(exception=e).error("Email dispatcher iteration failed")
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=settings.mail_dispatch_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send_batch(self, batch: list) -> list:
+        """
+        Sends a claimed batch concurrently. Messages not sent within mail_batch_timeout
+        are cancelled and recorded as failed attempts, so a stalled SMTP server cannot
+        hold the dispatcher.
+        """
+        tasks = [asyncio.create_task(self._send(*message)) for message in batch]
+        _, pending = await asyncio.wait(tasks, timeout=settings.mail_batch_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            logger.error(
+                "{} emails not sent within {} s", len(pending), settings.mail_batch_timeout
+            )
+        return [
+            (message_id, attempts, "Send timed out", False)
+            if task in pending
+            else task.result()
+            for task, (message_id, _, _, _, attempts) in zip(tasks, batch)
+        ]
+
+    async def _send(self, message_id, kind, recipient, fields, attempts):
+        try:
+            message = await build_message(kind, recipient, fields)
+        except Exception as e:
+            logger.opt(exception=e).error("Email {} cannot be built", message_id)
+            return message_id, attempts, repr(e), True
+        # Второй заход - если простаивавшее соединение закрыл сервер
+        for retry in (False, True):
+            try:
+                smtp = await self.pool.acquire()
+            except Exception as e:
+                logger.warning("SMTP connection failed: {}", e)
+                return message_id, attempts, repr(e), False
+            try:
+                await smtp.send_message(message)
+            except asyncio.CancelledError:
+                # Пакет не уложился в mail_batch_timeout: соединение в неизвестном состоянии
+                self.pool.discard(smtp)
+                raise
+            except aiosmtplib.SMTPServerDisconnected as e:
+                self.pool.discard(smtp)
+                if retry:
+                    return message_id, attempts, repr(e), False
+                continue
+            except aiosmtplib.SMTPRecipientsRefused as e:
+                self.pool.release(smtp)
+                logger.warning("Email {} recipients refused", message_id)
+                return message_id, attempts, repr(e), True
+            except aiosmtplib.SMTPResponseException as e:
+                self.pool.release(smtp)
+                logger.warning("Email {} rejected: {} {}", message_id, e.code, e.message)
+                return message_id, attempts, f"{e.code} {e.message}", e.code >= 500
+            except Exception as e:
+                self.pool.discard(smtp)
+                logger.warning("Email {} failed: {}", message_id, e)
+                return message_id, attempts, repr(e), False
+            self.pool.release(smtp)
+            logger.debug("Email {} sent to {}", message_id, recipient)
+            return message_id, attempts, None, False
 
-        message = MessageSchema(
-            subject="Recovery code",
-            recipients=[email],
-            template_body={
-                "host": host,
-                "recovery_code": recovery_code,
-            },
-            subtype=MessageType.html,
-            attachments=[
-                UploadFile(filename="qrcode.png", file=BytesIO(qr_code_bytes)),
-                UploadFile(filename="recovery_key.bin", file=recovery_file),
-            ],
-        )
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="recovery_code.html")
-        logger.debug(f"Sending email to {email} with QR code done!")
-    except ConnectionErrors as err:
-        print(err)
+email_dispatcher = EmailDispatcher()
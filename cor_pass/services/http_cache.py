@@ -0,0 +1,46 @@
+"""
+Условные запросы: ETag / If-None-Match
+"""
+import hashlib
+
+from fastapi import Response, status
+
+
+def make_etag(*parts, weak: bool = False) -> str:
+    """
+    The make_etag function builds an entity tag from a hash of the given parts.
+    """
+    digest = hashlib.sha256("\x00".join(str(part) for part in parts).encode())
+    tag = f'"{digest.hexdigest()[:32]}"'
+    return f"W/{tag}" if weak else tag
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    The etag_matches function checks an If-None-Match header against an entity tag
+    using the weak comparison of RFC 9110 (the W/ prefix is ignored).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def validator_headers(etag: str) -> dict:
+    """
+    The validator_headers function returns the headers that make private clients cache
+    a response and revalidate it on every use.
+    """
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified(headers: dict) -> Response:
+    """
+    The not_modified function returns an empty 304 response carrying the validator headers.
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -0,0 +1,143 @@
+"""
+Асимметричные ключи подписи JWT и публикация JWKS
+"""
+import base64
+import json
+import os
+import secrets
+import sys
+import time
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from jose import jwk
+
+from cor_pass.config.config import settings
+from cor_pass.services.logger import logger
+
+ASYMMETRIC_ALGORITHMS = {"ES256": (ec.SECP256R1(), "P-256", 32)}
+
+
+def _b64url_uint(value: int, length: int) -> str:
+    return base64.urlsafe_b64encode(value.to_bytes(length, "big")).rstrip(b"=").decode()
+
+
+class SigningKeyStore:
+    """
+    Keeps the EC key pairs used to sign tokens when ``settings.algorithm`` is asymmetric.
+
+    Every ``<kid>.pem`` file in ``keys_dir`` is a private key. The newest one (kid names
+    sort by creation time) signs new tokens, all of them stay valid for verification
+    and are published in the JWKS, so keys can be rotated without logging anybody out.
+    """
+
+    def __init__(self, keys_dir: str, algorithm: str):
+        self.keys_dir = Path(keys_dir)
+        self.algorithm = algorithm
+        self.enabled = algorithm in ASYMMETRIC_ALGORITHMS
+        self.signing_kid = None
+        self._signing_keys = {}
+        self._verification_keys = {}
+        self._jwks_json = json.dumps({"keys": []}).encode()
+        self._loaded = False
+
+    def load(self) -> None:
+        """
+        The load function reads every PEM file in keys_dir, prepares jose key objects once
+        and renders the JWKS document that is served by /.well-known/jwks.json.
+        """
+        curve, crv, size = ASYMMETRIC_ALGORITHMS[self.algorithm]
+        signing_keys, verification_keys, public_jwks = {}, {}, []
+        for pem_path in sorted(self.keys_dir.glob("*.pem")):
+            kid = pem_path.stem
+            private_key = serialization.load_pem_private_key(
+                pem_path.read_bytes(), password=None
+            )
+            if not isinstance(private_key.curve, type(curve)):
+                raise ValueError(f"Key {pem_path} does not match {self.algorithm}")
+            public_key = private_key.public_key()
+            signing_keys[kid] = jwk.construct(private_key, self.algorithm)
+            verification_keys[kid] = jwk.construct(public_key, self.algorithm)
+            numbers = public_key.public_numbers()
+            public_jwks.append(
+                {
+                    "kty": "EC",
+                    "crv": crv,
+                    "x": _b64url_uint(numbers.x, size),
+                    "y": _b64url_uint(numbers.y, size),
+                    "use": "sig",
+                    "alg": self.algorithm,
+                    "kid": kid,
+                }
+            )
+        if not signing_keys:
+            raise RuntimeError(
+                f"No signing keys for {self.algorithm} found in {self.keys_dir}"
+            )
+        self._signing_keys = signing_keys
+        self._verification_keys = verification_keys
+        self.signing_kid = max(signing_keys)
+        self._jwks_json = json.dumps({"keys": public_jwks}).encode()
+        self._loaded = True
+        logger.info(
+            "Loaded {} JWT signing keys, active kid {}",
+            len(signing_keys),
+            self.signing_kid,
+        )
+
+    def _ensure_loaded(self) -> None:
+        if self.enabled and not self._loaded:
+            self.load()
+
+    @property
+    def signing_key(self):
+        self._ensure_loaded()
+        return self.signing_kid, self._signing_keys[self.signing_kid]
+
+    def verification_key(self, kid: str | None):
+        self._ensure_loaded()
+        return self._verification_keys.get(kid)
+
+    @property
+    def jwks_json(self) -> bytes:
+        self._ensure_loaded()
+        return self._jwks_json
+
+
+def generate_signing_key(keys_dir: str, algorithm: str = "ES256") -> str:
+    """
+    The generate_signing_key function writes a new private key to keys_dir and returns its kid.
+    Running workers pick it up after a restart; old keys should be removed only after
+    the tokens they signed have expired.
+    """
+    curve = ASYMMETRIC_ALGORITHMS[algorithm][0]
+    private_key = ec.generate_private_key(curve)
+    # Метка времени сохраняет сортировку по созданию, случайный суффикс различает
+    # ключи, созданные в одну секунду
+    kid = f'{time.strftime("%Y%m%d%H%M%S", time.gmtime())}-{secrets.token_hex(4)}'
+    keys_path = Path(keys_dir)
+    keys_path.mkdir(parents=True, exist_ok=True)
+    pem_path = keys_path / f"{kid}.pem"
+    # O_EXCL: существующий (возможно, уже опубликованный) ключ не перезаписывается
+    descriptor = os.open(pem_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(descriptor, "wb") as pem_file:
+        pem_file.write(
+            private_key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=serialization.NoEncryption(),
+            )
+        )
+    return kid
+
+
+key_store = SigningKeyStore(settings.jwt_keys_dir, settings.algorithm)
+
+
+if __name__ == "__main__":
+    # Ротация ключа: python -m cor_pass.services.jwks generate
+    if sys.argv[1:] != ["generate"]:
+        sys.exit("usage: python -m cor_pass.services.jwks generate")
+    algorithm = settings.algorithm if key_store.enabled else "ES256"
+    print(generate_signing_key(settings.jwt_keys_dir, algorithm))
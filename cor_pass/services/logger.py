@@ -1,23 +1,106 @@
 from loguru import logger
+import hashlib
+import json
 import sys
+import time
+import traceback
+import uuid
+from contextvars import ContextVar
+from datetime import timezone
 from cor_pass.config.config import settings
 
 logger_level = "DEBUG" if settings.debug else "INFO"
 
+# Контекст текущего HTTP-запроса: request_id, scope (для шаблона маршрута), хэш пользователя
+request_context: ContextVar[dict | None] = ContextVar("request_context", default=None)
+
+
+def _add_request_context(record):
+    context = request_context.get()
+    extra = record["extra"]
+    if context is None:
+        extra.setdefault("request_id", "-")
+        return
+    extra.setdefault("request_id", context["request_id"])
+    route = context["scope"].get("route")
+    extra.setdefault("route", getattr(route, "path", None))
+    if context["user"] is not None:
+        extra.setdefault("user", context["user"])
+
+
+def _json_format(record) -> str:
+    extra = record["extra"]
+    entry = {
+        "time": record["time"].astimezone(timezone.utc).isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "module": record["name"],
+        "function": record["function"],
+        "request_id": extra.get("request_id"),
+        "route": extra.get("route"),
+        "user": extra.get("user"),
+        "latency_ms": extra.get("latency_ms"),
+    }
+    if "status" in extra:
+        entry["status"] = extra["status"]
+    if record["exception"] is not None:
+        entry["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    extra["_json"] = json.dumps(entry, ensure_ascii=False, default=str)
+    return "{extra[_json]}\n"
+
+
 logger.remove()
+logger.configure(patcher=_add_request_context)
 
 logger.add(
-    "logs/application.log",  # Путь к файлу логов
+    "logs/application.log",  # Путь к файлу логов, JSON-строки для promtail/Loki
     rotation="500 MB",  # Размер файла перед ротацией
     retention="10 days",  # Хранение логов в течение 10 дней
     compression="zip",  # Сжатие старых логов
     level=logger_level,  # Уровень логирования
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
+    format=_json_format,
+    enqueue=True,  # Запись в файл в отдельном потоке, запрос не ждет диск
 )
 
 
 logger.add(
     sys.stdout,  # Вывод в консоль
     level=logger_level,  # Уровень логирования
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
+    format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {extra[request_id]} | {message}",
+    enqueue=True,
 )
+
+
+def bind_user(user_id: str) -> None:
+    """
+    The bind_user function attaches a hash of the user id to every log line of the current request.
+    The raw id never reaches the log storage.
+    """
+    context = request_context.get()
+    if context is not None:
+        context["user"] = hashlib.sha256(user_id.encode()).hexdigest()[:16]
+
+
+async def logging_middleware(request, call_next):
+    """
+    The logging_middleware function assigns a request id (taken from X-Request-ID when the
+    proxy sends one), exposes it to every log line of the request and writes one access
+    line with the latency once the response is ready.
+    """
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = request_context.set(
+        {"request_id": request_id, "scope": request.scope, "user": None}
+    )
+    start_time = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        logger.bind(
+            latency_ms=round((time.perf_counter() - start_time) * 1000, 3),
+            status=status_code,
+        ).info("{} {}", request.method, request.url.path)
+        request_context.reset(token)
@@ -0,0 +1,112 @@
+"""
+Prometheus RED-метрики (rate, errors, duration) для всех маршрутов
+"""
+import os
+import time
+
+from fastapi import Request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from cor_pass.config.config import settings
+from cor_pass.services import sql_metrics
+
+
+LABELS = ("method", "route", "status")
+
+REQUEST_COUNT = Counter(
+    "http_requests_total", "Total number of HTTP requests", LABELS
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency in seconds",
+    LABELS,
+    buckets=settings.metrics_latency_buckets,
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size in bytes",
+    LABELS,
+    buckets=settings.metrics_size_buckets,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being processed",
+    ("method",),
+    multiprocess_mode="livesum",
+)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    The render_metrics function renders the exposition for a scrape.
+    Under several workers (PROMETHEUS_MULTIPROC_DIR is set) a fresh registry
+    aggregates the per-process files, so every scrape sees totals for all workers
+    regardless of which one answers it.
+
+    :return: The metrics payload and its content type
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def route_template(request: Request) -> str:
+    """
+    The route_template function returns the path template of the matched route
+    (``/api/records/{record_id}``), so label cardinality does not grow with ids.
+    Requests that did not match any route share one label.
+    """
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+async def _sized_body(body_iterator, size):
+    sent = 0
+    try:
+        async for chunk in body_iterator:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        size.observe(sent)
+
+
+async def metrics_middleware(request: Request, call_next):
+    """
+    The metrics_middleware function records count, latency, response size and
+    in-flight requests for every route, labelled by route template, method and status class.
+    SQL statements issued by the request are attributed to the same route.
+    """
+    method = request.method
+    in_progress = REQUESTS_IN_PROGRESS.labels(method)
+    in_progress.inc()
+    start_time = time.perf_counter()
+    query_stats_token = sql_metrics.start_request(request.scope)
+    response = None
+    try:
+        response = await call_next(request)
+        return response
+    finally:
+        elapsed = time.perf_counter() - start_time
+        in_progress.dec()
+        sql_metrics.finish_request(query_stats_token)
+        status_class = f"{response.status_code // 100}xx" if response is not None else "5xx"
+        labels = (method, route_template(request), status_class)
+        REQUEST_COUNT.labels(*labels).inc()
+        REQUEST_LATENCY.labels(*labels).observe(elapsed)
+        if response is not None:
+            size = RESPONSE_SIZE.labels(*labels)
+            if "content-length" in response.headers:
+                size.observe(int(response.headers["content-length"]))
+            else:
+                # Потоковый ответ (экспорт, пакетный Cor-ID): размер известен после отправки
+                response.body_iterator = _sized_body(response.body_iterator, size)
@@ -1,8 +1,19 @@
+"""
+Рендеринг QR-кодов
+"""
 from io import BytesIO
+
 import qrcode
+from qrcode.image.svg import SvgPathImage
+
+# format -> media type
+QR_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
 
 
-def generate_qr_code(data: str) -> bytes:
+def _render(data: str, image_format: str) -> bytes:
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -12,10 +23,23 @@ def generate_qr_code(data: str) -> bytes:
     qr.add_data(data)
     qr.make(fit=True)
 
-    img = qr.make_image(fill_color="black", back_color="white")
-
     buffered = BytesIO()
-    img.save(buffered)
-    img_bytes = buffered.getvalue()
+    if image_format == "svg":
+        # Один <path> на все модули вместо отдельного элемента на каждый
+        qr.make_image(image_factory=SvgPathImage).save(buffered)
+    else:
+        # Черно-белое изображение сохраняется как 1-битный PNG
+        img = qr.make_image(fill_color="black", back_color="white")
+        img.save(buffered, optimize=True)
+    return buffered.getvalue()
+
 
-    return img_bytes
+def generate_qr_code(data: str, image_format: str = "png") -> bytes:
+    """
+    The generate_qr_code function renders data as a QR image in one of QR_FORMATS.
+    Images are not cached: the callers render recovery codes, which must not stay
+    in the memory of the process.
+    """
+    if image_format not in QR_FORMATS:
+        raise ValueError(f"Unsupported QR format: {image_format}")
+    return _render(data, image_format)
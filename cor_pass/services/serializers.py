@@ -0,0 +1,52 @@
+"""
+Предсобранные сериализаторы ответов: ORM-объекты -> JSON-байты за один проход pydantic-core
+"""
+from typing import List
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from cor_pass.schemas import (
+    OTPRecordResponse,
+    RecordChangesResponse,
+    RecordResponse,
+    RecordSearchResponse,
+    TagResponse,
+    TagUsageResponse,
+    UserDb,
+)
+
+
+class ResponseSerializer:
+    """
+    Validates ORM objects (or dicts) against a response schema and dumps them straight
+    to JSON bytes in pydantic-core. The TypeAdapter is built once per schema.
+
+    Routes that return serializer.response(...) keep their response_model for the
+    OpenAPI schema, while FastAPI skips its own validation and jsonable_encoder pass.
+    """
+
+    def __init__(self, schema):
+        self.adapter = TypeAdapter(schema)
+
+    def dump(self, objects) -> bytes:
+        return self.adapter.dump_json(
+            self.adapter.validate_python(objects, from_attributes=True)
+        )
+
+    def response(self, objects, status_code: int = 200, headers: dict | None = None) -> Response:
+        return Response(
+            content=self.dump(objects),
+            status_code=status_code,
+            headers=headers,
+            media_type="application/json",
+        )
+
+
+records_serializer = ResponseSerializer(List[RecordResponse])
+record_changes_serializer = ResponseSerializer(RecordChangesResponse)
+record_search_serializer = ResponseSerializer(RecordSearchResponse)
+otp_records_serializer = ResponseSerializer(List[OTPRecordResponse])
+tags_serializer = ResponseSerializer(List[TagResponse])
+tag_usage_serializer = ResponseSerializer(List[TagUsageResponse])
+users_serializer = ResponseSerializer(List[UserDb])
@@ -0,0 +1,114 @@
+"""
+Учет SQL-запросов по маршрутам: счетчики, время в БД, медленные запросы и бюджеты
+"""
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from prometheus_client import Histogram
+
+from cor_pass.config.config import settings
+from cor_pass.services.logger import logger
+
+
+DB_STATEMENTS = Histogram(
+    "db_statements_per_request",
+    "SQL statements issued while serving one HTTP request",
+    ("route",),
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+DB_TIME = Histogram(
+    "db_time_per_request_seconds",
+    "Time spent in SQL statements while serving one HTTP request",
+    ("route",),
+    buckets=settings.metrics_latency_buckets,
+)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+@dataclass
+class QueryStats:
+    scope: dict
+    statements: int = 0
+    db_time: float = 0.0
+    budget_reported: bool = field(default=False, repr=False)
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+
+current_query_stats: ContextVar[QueryStats | None] = ContextVar(
+    "current_query_stats", default=None
+)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%\(\w+\)s|:\w+|__\[POSTCOMPILE_\w+\])\s*,?)+\)", re.I)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    The normalize_sql function reduces a statement to its shape: literals become ``?``,
+    IN-lists of any length collapse to ``IN (...)`` and whitespace is squeezed,
+    so the slow-query log groups statements that differ only by their values.
+    """
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    statement = _IN_LIST.sub("IN (...)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+def start_request(scope: dict):
+    """
+    Starts counting statements for the current request. Returns the contextvar token
+    that finish_request needs.
+    """
+    return current_query_stats.set(QueryStats(scope=scope))
+
+
+def finish_request(token) -> None:
+    stats = current_query_stats.get()
+    current_query_stats.reset(token)
+    if stats is None or not stats.statements:
+        return
+    DB_STATEMENTS.labels(stats.route).observe(stats.statements)
+    DB_TIME.labels(stats.route).observe(stats.db_time)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    stats = current_query_stats.get()
+    route = stats.route if stats is not None else "-"
+    if elapsed >= settings.sql_slow_query_seconds:
+        logger.warning(
+            "Slow query {:.3f}s on {}: {}", elapsed, route, normalize_sql(statement)
+        )
+    if stats is None:
+        return
+    stats.statements += 1
+    stats.db_time += elapsed
+    budget = settings.sql_query_budgets.get(route, settings.sql_query_budget)
+    if stats.statements > budget and not stats.budget_reported:
+        stats.budget_reported = True
+        message = f"Query budget of {budget} exceeded on {route}: {normalize_sql(statement)}"
+        if settings.sql_query_budget_strict:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def handle_error(exception_context) -> None:
+    # after_cursor_execute не вызывается для упавшего запроса
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_time"):
+        connection.info["query_start_time"].pop()
@@ -0,0 +1,140 @@
+"""
+Экспорт записей пользователя: NDJSON, CSV и зашифрованный архив
+
+Формат архива (.corpass):
+    заголовок: magic (8 байт) | salt (16) | log2(n), r, p параметры scrypt (по 1 байту)
+    кадры:     длина (<I) | nonce (12) | AES-GCM(данные)
+Ключ - scrypt(пароль архива, salt). AAD кадра - заголовок, номер кадра и признак
+последнего кадра, так что кадры нельзя переставить, а обрезанный архив не расшифруется.
+Данные внутри - NDJSON, как у формата ndjson.
+"""
+import csv
+import getpass
+import io
+import json
+import os
+import struct
+import sys
+from typing import BinaryIO, Iterable, Iterator, List
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+EXPORT_FIELDS = [
+    "record_id",
+    "record_name",
+    "website",
+    "username",
+    "password",
+    "notes",
+    "tags",
+    "created_at",
+    "edited_at",
+]
+
+ARCHIVE_MAGIC = b"CORPEXP1"
+_ARCHIVE_HEADER = struct.Struct("<8s16sBBB")
+_FRAME_LENGTH = struct.Struct("<I")
+_FRAME_AAD = struct.Struct("<QB")
+_SCRYPT_LOG2_N, _SCRYPT_R, _SCRYPT_P = 15, 8, 1
+
+
+def ndjson_chunks(batches: Iterable[List[dict]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in batch
+        ).encode()
+
+
+def csv_chunks(batches: Iterable[List[dict]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows({**row, "tags": ",".join(row["tags"])} for row in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _derive_archive_key(passphrase: str, salt: bytes, log2_n: int, r: int, p: int) -> bytes:
+    return Scrypt(salt=salt, length=32, n=1 << log2_n, r=r, p=p).derive(
+        passphrase.encode()
+    )
+
+
+def archive_chunks(batches: Iterable[List[dict]], passphrase: str) -> Iterator[bytes]:
+    """
+    The archive_chunks function encrypts the NDJSON export frame by frame, one frame per
+    batch, so the archive is streamed without being held in memory.
+    """
+    header = _ARCHIVE_HEADER.pack(
+        ARCHIVE_MAGIC, os.urandom(16), _SCRYPT_LOG2_N, _SCRYPT_R, _SCRYPT_P
+    )
+    _, salt, log2_n, r, p = _ARCHIVE_HEADER.unpack(header)
+    aesgcm = AESGCM(_derive_archive_key(passphrase, salt, log2_n, r, p))
+    yield header
+
+    def frame(index: int, data: bytes, final: bool) -> bytes:
+        nonce = os.urandom(12)
+        ciphertext = aesgcm.encrypt(nonce, data, header + _FRAME_AAD.pack(index, final))
+        return _FRAME_LENGTH.pack(len(ciphertext)) + nonce + ciphertext
+
+    index = 0
+    for chunk in ndjson_chunks(batches):
+        yield frame(index, chunk, False)
+        index += 1
+    yield frame(index, b"", True)
+
+
+def read_archive(stream: BinaryIO, passphrase: str) -> Iterator[bytes]:
+    """
+    The read_archive function decrypts an archive written by archive_chunks and yields
+    its NDJSON chunks.
+
+    :raises ValueError: If the file is not an archive, was modified or is truncated
+    """
+    header = stream.read(_ARCHIVE_HEADER.size)
+    if len(header) != _ARCHIVE_HEADER.size:
+        raise ValueError("Not a COR-Pass export archive")
+    magic, salt, log2_n, r, p = _ARCHIVE_HEADER.unpack(header)
+    if magic != ARCHIVE_MAGIC:
+        raise ValueError("Not a COR-Pass export archive")
+    aesgcm = AESGCM(_derive_archive_key(passphrase, salt, log2_n, r, p))
+    index = 0
+    while True:
+        length = stream.read(_FRAME_LENGTH.size)
+        if len(length) != _FRAME_LENGTH.size:
+            raise ValueError("The archive is truncated")
+        (size,) = _FRAME_LENGTH.unpack(length)
+        nonce, ciphertext = stream.read(12), stream.read(size)
+        if len(ciphertext) != size:
+            raise ValueError("The archive is truncated")
+        for final in (False, True):
+            try:
+                data = aesgcm.decrypt(
+                    nonce, ciphertext, header + _FRAME_AAD.pack(index, final)
+                )
+                break
+            except InvalidTag:
+                continue
+        else:
+            raise ValueError("Wrong passphrase or damaged archive")
+        if final:
+            if stream.read(1):
+                raise ValueError("Unexpected data after the end of the archive")
+            return
+        yield data
+        index += 1
+
+
+if __name__ == "__main__":
+    # Расшифровка архива: python -m cor_pass.services.vault_export decrypt export.corpass > export.ndjson
+    if len(sys.argv) != 3 or sys.argv[1] != "decrypt":
+        sys.exit("usage: python -m cor_pass.services.vault_export decrypt <archive>")
+    with open(sys.argv[2], "rb") as archive:
+        for chunk in read_archive(archive, getpass.getpass("Archive passphrase: ")):
+            sys.stdout.buffer.write(chunk)
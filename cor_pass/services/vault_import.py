@@ -0,0 +1,174 @@
+"""
+Разбор файлов экспорта других менеджеров паролей для импорта записей
+
+Поддерживаются CSV Bitwarden, KeePass/KeePassXC и Chrome, JSON Bitwarden, а также
+собственный экспорт COR-Pass (NDJSON и CSV, см. vault_export).
+"""
+import codecs
+import csv
+import io
+import json
+from typing import BinaryIO, Iterator, Tuple
+
+IMPORT_FORMATS = ("auto", "csv", "json", "ndjson")
+
+# Поле записи -> возможные названия колонки (в нижнем регистре)
+_CSV_COLUMNS = {
+    "record_name": ("record_name", "name", "title"),
+    "website": ("website", "url", "login_uri"),
+    "username": ("username", "login_username"),
+    "password": ("password", "login_password"),
+    "notes": ("notes", "note"),
+    "folder": ("folder", "group"),
+    "tags": ("tags",),
+}
+# Корневые группы KeePass не являются тэгами
+_ROOT_GROUPS = {"root", "database", "passwords"}
+
+# (номер строки/элемента, запись или None, ошибка или None)
+Entry = Tuple[int, dict | None, str | None]
+
+
+def _entry(
+    record_name=None, website=None, username=None, password=None, notes=None, tags=()
+) -> dict | None:
+    record_name = record_name or website or username
+    if not record_name:
+        return None
+    return {
+        "record_name": record_name,
+        "website": website or "",
+        "username": username or "",
+        "password": password or "",
+        "notes": notes or "",
+        "tags": [tag for tag in dict.fromkeys(tag.strip() for tag in tags) if tag],
+    }
+
+
+def _folder_tags(folder: str | None) -> list:
+    if not folder:
+        return []
+    # "Root/Email/Work" -> "Work"
+    name = folder.replace("\\", "/").rstrip("/").rsplit("/", 1)[-1]
+    return [] if name.lower() in _ROOT_GROUPS else [name]
+
+
+def _detect_format(stream: BinaryIO, filename: str | None) -> str:
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension in ("csv", "json", "ndjson"):
+        return extension
+    position = stream.tell()
+    start = stream.read(64)
+    stream.seek(position)
+    start = start.lstrip(codecs.BOM_UTF8).lstrip()
+    return "json" if start[:1] in (b"{", b"[") else "csv"
+
+
+def _csv_entries(text) -> Iterator[Entry]:
+    reader = csv.reader(text)
+    try:
+        header = next(reader)
+    except StopIteration:
+        return
+    positions = {name.strip().lower(): index for index, name in enumerate(header)}
+    columns = {
+        field: next((positions[name] for name in names if name in positions), None)
+        for field, names in _CSV_COLUMNS.items()
+    }
+    if columns["record_name"] is None and columns["website"] is None:
+        raise ValueError("Unrecognized CSV header")
+    try:
+        for row in reader:
+            line = reader.line_num
+
+            def value(field):
+                index = columns[field]
+                return row[index] if index is not None and index < len(row) else None
+
+            tags = _folder_tags(value("folder"))
+            if value("tags"):
+                tags += value("tags").split(",")
+            website = value("website")
+            entry = _entry(
+                record_name=value("record_name"),
+                # Bitwarden перечисляет несколько URI через запятую
+                website=website.split(",")[0] if website else website,
+                username=value("username"),
+                password=value("password"),
+                notes=value("notes"),
+                tags=tags,
+            )
+            yield line, entry, None if entry else "Entry has no name, url or username"
+    except csv.Error as e:
+        raise ValueError(f"CSV error at line {reader.line_num}: {e}")
+
+
+def _bitwarden_entries(document: dict) -> Iterator[Entry]:
+    folders = {folder.get("id"): folder.get("name") for folder in document.get("folders") or []}
+    for index, item in enumerate(document.get("items") or [], start=1):
+        login = item.get("login") or {}
+        uris = login.get("uris") or []
+        entry = _entry(
+            record_name=item.get("name"),
+            website=uris[0].get("uri") if uris else None,
+            username=login.get("username"),
+            password=login.get("password"),
+            notes=item.get("notes"),
+            tags=_folder_tags(folders.get(item.get("folderId"))),
+        )
+        yield index, entry, None if entry else "Item has no name, url or username"
+
+
+def _plain_entry(index: int, item) -> Entry:
+    if not isinstance(item, dict):
+        return index, None, "Entry is not an object"
+    tags = item.get("tags") or []
+    entry = _entry(
+        record_name=item.get("record_name") or item.get("name"),
+        website=item.get("website") or item.get("url"),
+        username=item.get("username"),
+        password=item.get("password"),
+        notes=item.get("notes"),
+        tags=tags if isinstance(tags, list) else [],
+    )
+    return index, entry, None if entry else "Entry has no name, url or username"
+
+
+def parse_entries(stream: BinaryIO, filename: str | None, import_format: str = "auto") -> Iterator[Entry]:
+    """
+    The parse_entries function reads an export file entry by entry.
+    CSV and NDJSON are parsed as the file is read; a JSON document is parsed whole.
+
+    :param stream: BinaryIO: The uploaded file
+    :param filename: str | None: The file name, used to detect the format
+    :param import_format: str: One of IMPORT_FORMATS
+    :return: An iterator of (line or item number, entry or None, error or None)
+    :raises ValueError: If the file cannot be parsed
+    """
+    if import_format == "auto":
+        import_format = _detect_format(stream, filename)
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    if import_format == "csv":
+        yield from _csv_entries(text)
+    elif import_format == "ndjson":
+        for index, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                yield index, None, "Invalid JSON"
+                continue
+            yield _plain_entry(index, item)
+    else:
+        try:
+            document = json.load(text)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if isinstance(document, dict) and "items" in document:
+            yield from _bitwarden_entries(document)
+        elif isinstance(document, list):
+            for index, item in enumerate(document, start=1):
+                yield _plain_entry(index, item)
+        else:
+            raise ValueError("Unrecognized JSON export")
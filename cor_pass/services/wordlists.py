@@ -0,0 +1,161 @@
+"""
+Большие словари для парольных фраз в компактном бинарном формате (mmap)
+
+Формат файла <name>.cwl:
+    magic (8 байт) | count (<I) | count + 1 смещений (<I) | слова в UTF-8 подряд
+Слово i - blob[offsets[i]:offsets[i + 1]].
+"""
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+from pathlib import Path
+
+from cor_pass.config.config import settings
+
+MAGIC = b"CORWL\x00\x01\x00"
+SUFFIX = ".cwl"
+DEFAULT_WORDLIST = "en-basic"
+WORDLIST_NAME_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+
+_HEADER = struct.Struct("<8sI")
+_OFFSET = struct.Struct("<I")
+_SPAN = struct.Struct("<II")
+
+
+class UnknownWordlist(LookupError):
+    pass
+
+
+class WordList:
+    """
+    A read-only wordlist backed by a memory-mapped file.
+
+    Words are decoded on access, nothing is copied into the Python heap: the pages
+    live in the OS page cache and are shared by every worker that maps the file.
+    The file is mapped on first use, so workers forked by gunicorn open their own map.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.name = path.stem
+        self._map = None
+        self._count = 0
+        self._blob_start = 0
+
+    def _open(self) -> mmap.mmap:
+        if self._map is None:
+            with open(self.path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, count = _HEADER.unpack_from(mapped)
+            if magic != MAGIC:
+                mapped.close()
+                raise ValueError(f"{self.path} is not a wordlist file")
+            self._count = count
+            self._blob_start = _HEADER.size + (count + 1) * _OFFSET.size
+            self._map = mapped
+        return self._map
+
+    def __len__(self) -> int:
+        self._open()
+        return self._count
+
+    def __getitem__(self, index: int) -> str:
+        mapped = self._open()
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        start, end = _SPAN.unpack_from(mapped, _HEADER.size + index * _OFFSET.size)
+        return mapped[self._blob_start + start : self._blob_start + end].decode("utf-8")
+
+    @property
+    def bits_per_word(self) -> float:
+        return math.log2(len(self))
+
+
+_wordlists = {}
+
+
+def get_wordlist(name: str) -> WordList:
+    """
+    The get_wordlist function returns the installed wordlist with the given name.
+
+    :param name: str: The file name of the list without the .cwl suffix
+    :return: The wordlist
+    :raises UnknownWordlist: If no such list is installed
+    """
+    wordlist = _wordlists.get(name)
+    if wordlist is None:
+        if not re.match(WORDLIST_NAME_PATTERN, name):
+            raise UnknownWordlist(name)
+        path = Path(settings.wordlists_dir) / f"{name}{SUFFIX}"
+        if not path.is_file():
+            raise UnknownWordlist(name)
+        wordlist = _wordlists[name] = WordList(path)
+    return wordlist
+
+
+def installed_wordlists() -> list:
+    """
+    The installed_wordlists function returns the names of the lists in settings.wordlists_dir.
+    """
+    return sorted(path.stem for path in Path(settings.wordlists_dir).glob(f"*{SUFFIX}"))
+
+
+def build_wordlist(source_path: str, name: str) -> Path:
+    """
+    The build_wordlist function converts a text wordlist (one word per line; for lists
+    like the EFF dice lists "11111<TAB>word" the last column is taken) into the binary
+    format. Duplicates and empty lines are dropped, the order is kept.
+
+    :param source_path: str: The text file, UTF-8
+    :param name: str: The name the list is installed under
+    :return: The path of the written file
+    """
+    if not re.match(WORDLIST_NAME_PATTERN, name):
+        raise ValueError(f"Invalid wordlist name: {name}")
+    seen = set()
+    encoded_words = []
+    with open(source_path, "r", encoding="utf-8") as file:
+        for line in file:
+            fields = line.split()
+            if not fields or fields[-1] in seen:
+                continue
+            seen.add(fields[-1])
+            encoded_words.append(fields[-1].encode("utf-8"))
+    if not encoded_words:
+        raise ValueError(f"{source_path} contains no words")
+
+    offsets = [0]
+    for word in encoded_words:
+        offsets.append(offsets[-1] + len(word))
+    wordlists_dir = Path(settings.wordlists_dir)
+    wordlists_dir.mkdir(parents=True, exist_ok=True)
+    path = wordlists_dir / f"{name}{SUFFIX}"
+    # Запись во временный файл и атомарная замена: уже открытый map не видит
+    # недописанный файл, новая версия подхватывается воркерами после перезапуска
+    temporary_path = path.with_suffix(".tmp")
+    with open(temporary_path, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, len(encoded_words)))
+        file.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        for word in encoded_words:
+            file.write(word)
+    os.replace(temporary_path, path)
+    return path
+
+
+if __name__ == "__main__":
+    # Установка словаря: python -m cor_pass.services.wordlists build eff_large_wordlist.txt en-eff
+    if len(sys.argv) == 4 and sys.argv[1] == "build":
+        path = build_wordlist(sys.argv[2], sys.argv[3])
+        wordlist = WordList(path)
+        print(f"{path}: {len(wordlist)} words, {wordlist.bits_per_word:.2f} bits per word")
+    elif sys.argv[1:] == ["list"]:
+        for name in installed_wordlists():
+            print(name)
+    else:
+        sys.exit(
+            "usage: python -m cor_pass.services.wordlists build <source.txt> <name>\n"
+            "       python -m cor_pass.services.wordlists list"
+        )
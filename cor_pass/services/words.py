@@ -1,10 +1,12 @@
-word_file_path = "en-basic"
+from pathlib import Path
 
+# Путь относительно пакета, а не рабочей директории процесса
+word_file_path = Path(__file__).resolve().parents[2] / "en-basic"
 
-def get_word_list(word_file_path):
+
+def get_word_list(word_file_path) -> tuple:
     with open(word_file_path, "r") as file:
-        words_list = [line.strip() for line in file]
-        return words_list
+        return tuple(line.strip() for line in file if line.strip())
 
 
 word_list = get_word_list(word_file_path)
@@ -0,0 +1,39 @@
+"""
+Запуск в несколько воркеров: gunicorn -c gunicorn.conf.py main:app
+Схему базы до запуска готовит python -m cor_pass.database.migrations
+"""
+import multiprocessing
+import os
+import shutil
+
+from cor_pass.config.config import settings
+
+# Каталог должен быть задан до импорта prometheus_client в воркерах
+multiproc_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", "/tmp/cor_pass_prometheus"
+)
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+graceful_timeout = 30
+timeout = 60
+
+# Кэш использованных OTP-кодов в памяти воркера не видит повторы в соседних воркерах
+if workers > 1 and not settings.otp_replay_redis_url:
+    raise RuntimeError(
+        f"OTP_REPLAY_REDIS_URL must be set to run {workers} workers: "
+        "the in-process OTP replay cache is not shared between them"
+    )
+
+
+def on_starting(server):
+    # Файлы метрик от прошлого запуска искажают счетчики
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
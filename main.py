@@ -1,16 +1,12 @@
-import time
-
 import uvicorn
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from fastapi import FastAPI, Request, Depends, HTTPException, status, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 import hashlib
 import hmac
-from prometheus_client import Counter, Histogram
-from prometheus_client import generate_latest
 from starlette.responses import Response
 
 from cor_pass.routes import auth, person
@@ -23,9 +19,13 @@ from cor_pass.routes import (
     cor_id,
     otp_auth,
     admin,
+    well_known,
 )
 from cor_pass.config.config import settings
-from cor_pass.services.logger import logger
+from cor_pass.services.logger import logger, logging_middleware
+from cor_pass.services.jwks import key_store
+from cor_pass.services.email import email_dispatcher
+from cor_pass.services.metrics import metrics_middleware, render_metrics
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from collections import defaultdict
@@ -34,7 +34,7 @@ from collections import defaultdict
 from datetime import datetime, timedelta
 
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 app.mount("/static", StaticFiles(directory="cor_pass/static"), name="static")
 
 origins = [
@@ -45,12 +45,8 @@ origins = [
 
 @app.get("/metrics")
 async def metrics():
-    return Response(generate_latest(), media_type="text/plain")
-
-
-# Пример метрик
-REQUEST_COUNT = Counter("app_requests_total", "Total number of requests")
-REQUEST_LATENCY = Histogram("app_request_latency_seconds", "Request latency")
+    content, media_type = render_metrics()
+    return Response(content, media_type=media_type)
 
 # Middleware для CORS
 app.add_middleware(
@@ -70,7 +66,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 
 @app.exception_handler(Exception)
 async def exception_handler(request: Request, exc: Exception):
-    logger.error("An unhandled exception occurred", exc_info=exc)
+    logger.opt(exception=exc).error("An unhandled exception occurred")
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "Internal Server Error"},
@@ -79,7 +75,7 @@ async def exception_handler(request: Request, exc: Exception):
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    logger.error("Request validation error", exc_info=exc)
+    logger.opt(exception=exc).error("Request validation error")
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={"detail": "Validation Error"},
@@ -95,14 +91,11 @@ def read_config():
 @app.get("/", name="Корень")
 def read_root(request: Request):
     logger.info("This is a test log message")
-    REQUEST_COUNT.inc()
-    with REQUEST_LATENCY.time():
-        return FileResponse("cor_pass/static/login.html")
+    return FileResponse("cor_pass/static/login.html")
 
 
 @app.get("/api/healthchecker")
 def healthchecker(db: Session = Depends(get_db)):
-    REQUEST_COUNT.inc()
     try:
         result = db.execute(text("SELECT 1")).fetchone()
         if result is None:
@@ -112,27 +105,33 @@ def healthchecker(db: Session = Depends(get_db)):
             )
         return {"message": "Welcome to FastApi, database work correctly"}
     except Exception as e:
-        logger.error("Database connection error", exc_info=e)
+        logger.opt(exception=e).error("Database connection error")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Error connecting to the database",
         )
 
 
-# Middleware для добавления заголовка времени обработки
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["My-Process-Time"] = str(process_time)
-    return response
+# Middleware метрик Prometheus для всех маршрутов
+app.middleware("http")(metrics_middleware)
+# Middleware request id и журнала запросов (внешний слой)
+app.middleware("http")(logging_middleware)
 
 
 # Событие при старте приложения
 @app.on_event("startup")
 async def startup():
     print("------------- STARTUP --------------")
+    if key_store.enabled:
+        key_store.load()
+    email_dispatcher.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await email_dispatcher.stop()
+    # Дописать очередь логов перед выходом
+    await logger.complete()
 
 
 auth_attempts = defaultdict(list)
@@ -182,6 +181,7 @@ app.include_router(password_generator.router, prefix="/api")
 app.include_router(person.router, prefix="/api")
 app.include_router(cor_id.router, prefix="/api")
 app.include_router(otp_auth.router, prefix="/api")
+app.include_router(well_known.router)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,27 @@
+import os
+import tempfile
+
+import pytest
+
+# Настройки читаются при импорте cor_pass, поэтому окружение задается до него
+_DB_DIR = tempfile.mkdtemp(prefix="cor_pass_tests_")
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URL", f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+)
+os.environ.setdefault("BASIC_ACCOUNT_RECORDS", "50")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("AES_KEY", "test-aes-key")
+os.environ.setdefault("FACILITY_KEY", "1")
+os.environ.setdefault("MAIL_PORT", "2525")
+os.environ.setdefault("MAIL_SERVER", "127.0.0.1")
+
+
+@pytest.fixture(scope="session")
+def app():
+    from cor_pass.database import migrations
+
+    migrations.create_tables(migrations.engine)
+    from main import app
+
+    return app
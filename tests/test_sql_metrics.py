@@ -0,0 +1,37 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from cor_pass.config.config import settings
+from cor_pass.services.sql_metrics import QueryBudgetExceeded
+
+SIGNUP = "/api/auth/signup"
+
+
+def signup_body(email: str) -> dict:
+    return {"email": email, "password": "secret12", "birth": 1990, "user_sex": "M"}
+
+
+@pytest.fixture
+def signup_budget(monkeypatch):
+    # Регистрация делает больше одного запроса: поиск пользователя и вставка
+    monkeypatch.setattr(settings, "sql_query_budgets", {SIGNUP: 1})
+
+
+def test_strict_budget_fails_the_request(app, signup_budget, monkeypatch):
+    monkeypatch.setattr(settings, "sql_query_budget_strict", True)
+
+    with pytest.raises(QueryBudgetExceeded, match=SIGNUP):
+        TestClient(app).post(SIGNUP, json=signup_body("strict@example.com"))
+
+    response = TestClient(app, raise_server_exceptions=False).post(
+        SIGNUP, json=signup_body("strict2@example.com")
+    )
+    assert response.status_code == 500
+
+
+def test_budget_only_warns_when_not_strict(app, signup_budget, monkeypatch):
+    monkeypatch.setattr(settings, "sql_query_budget_strict", False)
+
+    response = TestClient(app).post(SIGNUP, json=signup_body("lenient@example.com"))
+
+    assert response.status_code == 201